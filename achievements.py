@@ -0,0 +1,190 @@
+"""Выдача достижений по событиям.
+
+Правила (``RULES``) описывают, на какое событие смотрит значок и какое
+условие должно выполниться. Движок держит в памяти счётчики
+пользователя (``Progress``): пройденные викторины и квесты, изученные темы,
+серию дней и уже полученные значки. Событие меняет счётчики и проверяет
+только подписанные на него правила; значок выдаётся одним
+``INSERT OR IGNORE`` в транзакции, где записано само событие.
+
+Каждое правило несёт и SQL-выборку пользователей, которым значок
+положен по уже накопленным данным, — ей пользуется
+``database.backfill_achievements``.
+"""
+
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from config import ACHIEVEMENT_CACHE_SIZE
+from data.content import ACHIEVEMENTS, EDUCATION_TOPICS
+
+# События
+QUIZ_COMPLETED = "quiz_completed"
+QUEST_COMPLETED = "quest_completed"
+SECTION_VIEWED = "section_viewed"
+SCORE_CHANGED = "score_changed"
+DAY_ACTIVE = "day_active"
+CAREER_COMPLETED = "career_completed"
+
+QUIZ_MASTER_QUIZZES = 5
+QUEST_HERO_QUESTS = 3
+TOP_SCORER_PLACES = 3
+ACTIVE_USER_DAYS = 3
+
+_TOPIC_IDS = ", ".join(f"'{key}'" for key in EDUCATION_TOPICS)
+
+
+class Progress:
+    __slots__ = ("quizzes", "quests", "topics", "streak", "badges")
+
+    def __init__(self, quizzes: int = 0, quests: int = 0, topics=(), streak: int = 0, badges=()):
+        self.quizzes = quizzes
+        self.quests = quests
+        self.topics = set(topics)
+        self.streak = streak
+        self.badges = set(badges)
+
+
+@dataclass(frozen=True)
+class Rule:
+    badge_id: str
+    event: str
+    check: object
+    # SELECT user_id ... — кому значок положен по данным в БД (None — не восстанавливается)
+    backfill: str = None
+
+
+RULES = (
+    Rule(
+        "first_quiz", QUIZ_COMPLETED,
+        lambda p, e: p.quizzes >= 1,
+        "SELECT user_id FROM users WHERE quizzes_completed >= 1",
+    ),
+    Rule(
+        "quiz_master", QUIZ_COMPLETED,
+        lambda p, e: p.quizzes >= QUIZ_MASTER_QUIZZES,
+        f"SELECT user_id FROM users WHERE quizzes_completed >= {QUIZ_MASTER_QUIZZES}",
+    ),
+    Rule(
+        "perfect_score", QUIZ_COMPLETED,
+        lambda p, e: e["total"] > 0 and e["score"] == e["total"],
+        "SELECT DISTINCT user_id FROM quiz_results WHERE total > 0 AND score = total",
+    ),
+    Rule(
+        "first_quest", QUEST_COMPLETED,
+        lambda p, e: p.quests >= 1,
+        "SELECT user_id FROM users WHERE quests_completed >= 1",
+    ),
+    Rule(
+        "quest_hero", QUEST_COMPLETED,
+        lambda p, e: p.quests >= QUEST_HERO_QUESTS,
+        f"SELECT user_id FROM users WHERE quests_completed >= {QUEST_HERO_QUESTS}",
+    ),
+    Rule(
+        "explorer", SECTION_VIEWED,
+        lambda p, e: p.topics.issuperset(EDUCATION_TOPICS),
+        f"""SELECT user_id FROM topic_views WHERE topic_id IN ({_TOPIC_IDS})
+            GROUP BY user_id HAVING COUNT(*) = {len(EDUCATION_TOPICS)}""",
+    ),
+    Rule(
+        "top_scorer", SCORE_CHANGED,
+        lambda p, e: e["score"] > 0 and e["rank"] <= TOP_SCORER_PLACES,
+        f"""SELECT user_id FROM users WHERE score > 0
+            ORDER BY score DESC, user_id LIMIT {TOP_SCORER_PLACES}""",
+    ),
+    Rule(
+        "active_user", DAY_ACTIVE,
+        lambda p, e: p.streak >= ACTIVE_USER_DAYS,
+        f"SELECT user_id FROM users WHERE streak_days >= {ACTIVE_USER_DAYS}",
+    ),
+    Rule("career_found", CAREER_COMPLETED, lambda p, e: True),
+)
+
+
+def _apply(progress: Progress, event: str, payload: dict, loaded: bool):
+    """Учитывает событие в счётчиках.
+
+    ``loaded`` — счётчики только что прочитаны в той же транзакции и уже
+    включают это событие, прибавлять его второй раз нельзя.
+    """
+    if event == QUIZ_COMPLETED:
+        if not loaded:
+            progress.quizzes += 1
+    elif event == QUEST_COMPLETED:
+        if not loaded:
+            progress.quests += 1
+    elif event == SECTION_VIEWED:
+        progress.topics.add(payload["topic_id"])
+    elif event == DAY_ACTIVE:
+        progress.streak = payload["streak"]
+
+
+class AchievementEngine:
+    """Счётчики пользователей в памяти (LRU) и правила, сгруппированные по событиям."""
+
+    def __init__(self, rules, cache_size: int = 10_000):
+        self.cache_size = cache_size
+        self._rules = {}
+        for rule in rules:
+            self._rules.setdefault(rule.event, []).append(rule)
+        self._cache = OrderedDict()
+
+    def cached(self, user_id: int):
+        """Счётчики пользователя, если они уже в памяти, иначе None."""
+        return self._cache.get(user_id)
+
+    def forget(self, user_id: int):
+        """Сбрасывает счётчики — например, если транзакция с событием откатилась."""
+        self._cache.pop(user_id, None)
+
+    def clear(self):
+        self._cache.clear()
+
+    async def _load(self, db, user_id: int) -> Progress:
+        cursor = await db.execute(
+            """SELECT quizzes_completed, quests_completed, streak_days,
+                      (SELECT json_group_array(topic_id) FROM topic_views WHERE user_id = u.user_id),
+                      (SELECT json_group_array(badge_id) FROM achievements WHERE user_id = u.user_id)
+               FROM users u WHERE user_id = ?""",
+            (user_id,)
+        )
+        row = await cursor.fetchone()
+        if row is None:
+            return Progress()
+        return Progress(
+            row[0] or 0, row[1] or 0, json.loads(row[3]), row[2] or 0, json.loads(row[4]),
+        )
+
+    async def dispatch(self, db, user_id: int, event: str, **payload) -> list:
+        """Обрабатывает событие внутри транзакции ``db``, где оно уже записано.
+
+        Возвращает названия впервые полученных значков.
+        """
+        progress = self._cache.get(user_id)
+        loaded = progress is None
+        if loaded:
+            progress = await self._load(db, user_id)
+            self._cache[user_id] = progress
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(user_id)
+        _apply(progress, event, payload, loaded)
+
+        granted = []
+        for rule in self._rules.get(event, ()):
+            if rule.badge_id in progress.badges or not rule.check(progress, payload):
+                continue
+            name = ACHIEVEMENTS[rule.badge_id]["name"]
+            cursor = await db.execute(
+                "INSERT OR IGNORE INTO achievements (user_id, badge_id, badge_name) VALUES (?, ?, ?)",
+                (user_id, rule.badge_id, name)
+            )
+            progress.badges.add(rule.badge_id)
+            if cursor.rowcount:
+                granted.append(name)
+        return granted
+
+
+engine = AchievementEngine(RULES, ACHIEVEMENT_CACHE_SIZE)
@@ -0,0 +1,106 @@
+"""Выбор обработчика callback-кнопки: цепочка regex против CallbackRouter.
+
+Прежний путь — список ``CallbackQueryHandler`` главного меню (12
+шаблонов), который ConversationHandler проверяет по очереди до первого
+совпадения, плюс ``int(query.data.split(":")[1])`` в самом обработчике.
+Новый — ``CallbackRouter.check_update``: один разбор строки и поиск в
+словаре, аргументы уже приведены к типам. Замеряется только выбор
+обработчика и разбор аргументов, без сети и БД.
+
+Запуск из корня проекта:
+    python -m benchmarks.callback_dispatch [повторов]
+"""
+
+import sys
+import time
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import CallbackQueryHandler
+
+from routing import CallbackRouter, route
+
+
+async def noop(update, context):
+    pass
+
+
+# Главное меню до перехода на роутер
+REGEX_CHAIN = [
+    CallbackQueryHandler(noop, pattern="^education$"),
+    CallbackQueryHandler(noop, pattern="^quiz_list$"),
+    CallbackQueryHandler(noop, pattern=r"^quiz_start:\d+$"),
+    CallbackQueryHandler(noop, pattern="^quest_list$"),
+    CallbackQueryHandler(noop, pattern=r"^quest_begin:\d+$"),
+    CallbackQueryHandler(noop, pattern="^poll_list$"),
+    CallbackQueryHandler(noop, pattern="^profile$"),
+    CallbackQueryHandler(noop, pattern="^leaderboard$"),
+    CallbackQueryHandler(noop, pattern="^fact_of_day$"),
+    CallbackQueryHandler(noop, pattern="^career_test$"),
+    CallbackQueryHandler(noop, pattern="^admin_menu$"),
+    CallbackQueryHandler(noop, pattern="^back_to_menu$"),
+]
+
+ROUTER = CallbackRouter({
+    "education": route(noop),
+    "quiz_list": route(noop),
+    "quiz_start": route(noop, int),
+    "quest_list": route(noop),
+    "quest_begin": route(noop, int),
+    "poll_list": route(noop),
+    "profile": route(noop),
+    "leaderboard": route(noop),
+    "fact_of_day": route(noop),
+    "career_test": route(noop),
+    "admin_menu": route(noop),
+    "back_to_menu": route(noop),
+})
+
+# Кнопки из начала, середины и конца цепочки
+SAMPLES = ["education", "quiz_start:12", "profile", "career_test", "back_to_menu", "unknown"]
+
+
+def make_update(data: str) -> Update:
+    user = User(1, "Тест", False)
+    return Update(1, callback_query=CallbackQuery("1", user, "chat", data=data))
+
+
+def regex_dispatch(update: Update):
+    for handler in REGEX_CHAIN:
+        check = handler.check_update(update)
+        if check is not None and check is not False:
+            data = update.callback_query.data
+            args = [int(data.split(":")[1])] if ":" in data else []
+            return handler, args
+    return None
+
+
+def router_dispatch(update: Update):
+    return ROUTER.check_update(update)
+
+
+def measure(dispatch, update: Update, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        dispatch(update)
+    return (time.perf_counter() - started) / repeats * 1_000_000
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    print(f"{'callback_data':<18}{'regex, мкс':>12}{'роутер, мкс':>14}{'ускорение':>12}")
+    total_old = total_new = 0.0
+    for data in SAMPLES:
+        update = make_update(data)
+        old = measure(regex_dispatch, update, repeats)
+        new = measure(router_dispatch, update, repeats)
+        total_old += old
+        total_new += new
+        print(f"{data:<18}{old:>12.2f}{new:>14.2f}{old / new:>11.1f}x")
+
+    print(f"\nВ среднем: {total_old / len(SAMPLES):.2f} мкс против "
+          f"{total_new / len(SAMPLES):.2f} мкс на апдейт ({total_old / total_new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Загрузка экрана профиля: три запроса против get_profile_snapshot.
+
+Во временной БД создаются пользователи с тысячами попыток викторин.
+Прежний путь — ``get_user`` + ``get_user_achievements`` +
+``get_user_quiz_results`` (вся история, срез ``[:3]`` в Python); новый —
+один запрос с LIMIT в SQLite.
+
+Запуск из корня проекта:
+    python -m benchmarks.profile_snapshot [пользователей] [попыток_на_пользователя] [повторов]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import database
+from database import (
+    get_profile_snapshot, get_user, get_user_achievements, get_user_quiz_results,
+)
+
+
+async def fill(users: int, attempts: int):
+    quiz_ids = [q["id"] for q in await database.get_all_quizzes()]
+
+    async def op(db):
+        await db.executemany(
+            "INSERT INTO users (user_id, first_name, score) VALUES (?, ?, ?)",
+            [(user_id, f"u{user_id}", random.randint(0, 500)) for user_id in range(1, users + 1)]
+        )
+        await db.executemany(
+            "INSERT INTO quiz_results (user_id, quiz_id, score, total, completed_at) "
+            "VALUES (?, ?, ?, 5, datetime('now', ?))",
+            [
+                (user_id, random.choice(quiz_ids), random.randint(0, 5), f"-{n} minutes")
+                for user_id in range(1, users + 1) for n in range(attempts)
+            ]
+        )
+        await db.executemany(
+            "INSERT INTO achievements (user_id, badge_id, badge_name) VALUES (?, ?, ?)",
+            [
+                (user_id, badge_id, badge_id)
+                for user_id in range(1, users + 1) for badge_id in ("first_quiz", "quiz_master")
+            ]
+        )
+
+    await database._write(op)
+    await database.load_rank_index()
+
+
+async def three_queries(user_id: int):
+    user = await get_user(user_id)
+    achievements = await get_user_achievements(user_id)
+    results = (await get_user_quiz_results(user_id))[:3]
+    return user, achievements, results
+
+
+async def measure(load, users: int, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        await load(random.randint(1, users))
+    return (time.perf_counter() - started) / repeats * 1000
+
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    attempts = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "bench.db")
+        await database.init_pool()
+        try:
+            await database.init_db()
+            await database.seed_default_data()
+            print(f"Заполняем БД: {users} пользователей по {attempts} попыток...")
+            await fill(users, attempts)
+
+            old = await measure(three_queries, users, repeats)
+            new = await measure(get_profile_snapshot, users, repeats)
+        finally:
+            await database.close_pool()
+
+    print(f"\n{'Способ':<28}{'мс на профиль':>16}")
+    print(f"{'get_user + 2 запроса':<28}{old:>16.2f}")
+    print(f"{'get_profile_snapshot':<28}{new:>16.2f}")
+    print(f"\nУскорение: {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""Память на одну активную сессию: словари против классов со __slots__.
+
+Запуск из корня проекта:
+    python -m benchmarks.session_memory [количество_сессий]
+"""
+
+import sys
+import tracemalloc
+
+from data.content import CAREER_TEST_QUESTIONS
+from sessions import CareerSession, QuestSession, QuizSession
+
+
+def _career_tags():
+    # Теги, набранные за полностью пройденный тест (первый ответ на каждый вопрос)
+    return [tag for q in CAREER_TEST_QUESTIONS for tag in q["answers"][0]["tags"]]
+
+
+def quiz_dict(i):
+    return {"quiz_id": i % 50, "revision": 1, "current": 3, "score": 2}
+
+
+def quiz_slots(i):
+    session = QuizSession(i % 50, 1)
+    session.current, session.score = 3, 2
+    return session
+
+
+def quest_dict(i):
+    return {"quest_id": i % 50, "revision": 1, "current_step": 2}
+
+
+def quest_slots(i):
+    return QuestSession(i % 50, 1, 2)
+
+
+def career_dict(i):
+    return {"current": len(CAREER_TEST_QUESTIONS), "tags": _career_tags()}
+
+
+def career_slots(i):
+    session = CareerSession()
+    session.add_tags(_career_tags())
+    session.current = len(CAREER_TEST_QUESTIONS)
+    return session
+
+
+def measure(factory, count: int) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Сам список-контейнер к сессиям не относится
+    return (after - before - sys.getsizeof(sessions)) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    print(f"Сессий: {count}\n")
+    print(f"{'Сессия':<10}{'dict, байт':>14}{'__slots__, байт':>18}{'экономия':>12}")
+    for name, as_dict, as_slots in (
+        ("quiz", quiz_dict, quiz_slots),
+        ("quest", quest_dict, quest_slots),
+        ("career", career_dict, career_slots),
+    ):
+        before = measure(as_dict, count)
+        after = measure(as_slots, count)
+        print(f"{name:<10}{before:>14.0f}{after:>18.0f}{1 - after / before:>11.0%}")
+
+
+if __name__ == "__main__":
+    main()
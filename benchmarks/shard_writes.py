@@ -0,0 +1,118 @@
+"""Запись в одну SQLite из нескольких процессов-воркеров.
+
+При шардировании у каждого воркера свой ``DatabaseWriter``, и между
+процессами запись разводит блокировка файла (WAL + busy_timeout). Замер
+делит одинаковое число пользователей между 1, 2 и 4 процессами: каждый
+регистрирует своих пользователей и отмечает им день активности — то, что
+делает воркер на первом апдейте пользователя. Проверяется, что ни одна
+запись не упала с ``database is locked`` и все строки на месте.
+
+Запуск из корня проекта (БД — временный файл, рабочая не затрагивается):
+    python -m benchmarks.shard_writes [пользователей] [одновременно_в_процессе]
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import database
+
+
+def use_database(path: str):
+    database.DB_PATH = path
+
+
+async def write_users(user_ids: range, concurrency: int) -> tuple:
+    await database.init_pool()
+    began = time.time()
+    today = date.today()
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+    waits = []
+
+    async def one(user_id: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await database.ensure_user(user_id, f"u{user_id}", f"Пользователь {user_id}")
+                await database.record_active_day(
+                    user_id, today.isoformat(), (today - timedelta(days=1)).isoformat()
+                )
+            except sqlite3.OperationalError:
+                errors += 1
+            waits.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(user_id) for user_id in user_ids))
+    finished = time.time()
+    await database.close_pool()
+    waits.sort()
+    return began, finished, errors, waits[len(waits) // 2], waits[int(len(waits) * 0.99)]
+
+
+def worker(path: str, user_ids: range, concurrency: int, results):
+    use_database(path)
+    results.put(asyncio.run(write_users(user_ids, concurrency)))
+
+
+async def prepare(path: str):
+    use_database(path)
+    await database.init_db()
+
+
+async def count_rows(path: str) -> tuple:
+    use_database(path)
+    async with database._reader() as db:
+        cursor = await db.execute("SELECT COUNT(*), COUNT(last_active_day) FROM users")
+        return tuple(await cursor.fetchone())
+
+
+def run(processes: int, users: int, concurrency: int) -> tuple:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bot.db")
+        asyncio.run(prepare(path))
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        per_process = users // processes
+        workers = [
+            ctx.Process(
+                target=worker,
+                args=(path, range(n * per_process + 1, (n + 1) * per_process + 1), concurrency, results),
+            )
+            for n in range(processes)
+        ]
+        for process in workers:
+            process.start()
+        stats = [results.get() for _ in workers]
+        for process in workers:
+            process.join()
+        rows, active = asyncio.run(count_rows(path))
+
+    # Время записи без запуска процессов: от первого начала до последнего конца
+    elapsed = max(s[1] for s in stats) - min(s[0] for s in stats)
+    errors = sum(s[2] for s in stats)
+    p50 = max(s[3] for s in stats)
+    p99 = max(s[4] for s in stats)
+    return elapsed, errors, p50, p99, rows == active == per_process * processes
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+
+    print(f"Пользователей: {users}, одновременно в процессе: {concurrency}\n")
+    print(f"{'Процессов':<11}{'польз./с':>10}{'p50, мс':>10}{'p99, мс':>10}"
+          f"{'locked':>8}{'строки сошлись':>17}")
+    for processes in (1, 2, 4):
+        elapsed, errors, p50, p99, consistent = run(processes, users, concurrency)
+        print(f"{processes:<11}{users / elapsed:>10.0f}{p50 * 1000:>10.1f}{p99 * 1000:>10.1f}"
+              f"{errors:>8}{'да' if consistent else 'НЕТ':>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Пропускная способность KeyedUpdateProcessor в зависимости от лимита.
+
+Каждый апдейт имитирует обработчик, который ждёт ввода-вывода (запись в
+SQLite, запрос к Telegram). Проверяется и порядок: апдейты одного
+пользователя должны завершаться в том порядке, в каком пришли.
+
+Второй замер — перекошенная нагрузка: один пользователь присылает пачку
+апдейтов, следом остальные пишут как обычно. Показывается, когда
+заканчивается обработка апдейтов остальных и сколько апдейтов флудера
+отброшено, с ограничением на пользователя и без него.
+
+Запуск из корня проекта:
+    python -m benchmarks.update_processing [пользователей] [апдейтов_на_пользователя] [задержка_мс]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, Update, User
+
+from concurrency import KeyedUpdateProcessor
+
+LIMITS = (1, 4, 16, 64, 256)
+
+
+def make_update(update_id: int, user_id: int) -> Update:
+    user = User(user_id, f"u{user_id}", False)
+    chat = Chat(user_id, Chat.PRIVATE)
+    message = Message(update_id, datetime.now(timezone.utc), chat, from_user=user, text=".")
+    return Update(update_id, message=message)
+
+
+def make_updates(users: int, per_user: int) -> list:
+    # Пользователи пишут вперемешку, как в реальном потоке апдейтов
+    user_ids = [user_id for _ in range(per_user) for user_id in range(1, users + 1)]
+    return [make_update(n, user_id) for n, user_id in enumerate(user_ids, 1)]
+
+
+async def feed(processor: KeyedUpdateProcessor, updates: list, handler):
+    """Как Application: апдейт уходит в работу, когда процессор выделил ему место."""
+    tasks = []
+    for update in updates:
+        await processor.admit()
+        tasks.append(asyncio.create_task(processor.process_update(update, handler(update))))
+    await asyncio.gather(*tasks)
+
+
+async def run(limit: int, updates: list, delay: float):
+    processor = KeyedUpdateProcessor(limit)
+    finished = {}
+
+    async def handler(update):
+        await asyncio.sleep(delay)
+        finished.setdefault(update.effective_user.id, []).append(update.update_id)
+
+    started = time.perf_counter()
+    await feed(processor, updates, handler)
+    elapsed = time.perf_counter() - started
+
+    out_of_order = sum(1 for ids in finished.values() if ids != sorted(ids))
+    return len(updates) / elapsed, out_of_order
+
+
+async def run_skewed(limit: int, max_pending: int, max_per_key: int,
+                     flood: int, others: int, delay: float):
+    processor = KeyedUpdateProcessor(limit, max_pending, max_per_key)
+    # Флудер — пользователь 1, затем по одному апдейту от остальных
+    updates = [make_update(n, 1) for n in range(1, flood + 1)]
+    updates += [make_update(flood + n, 1 + n) for n in range(1, others + 1)]
+    done_at = {}
+
+    async def handler(update):
+        await asyncio.sleep(delay)
+        done_at[update.effective_user.id] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await feed(processor, updates, handler)
+    others_done = max(t for user_id, t in done_at.items() if user_id != 1)
+    return others_done, processor.dropped
+
+
+async def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    delay_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    updates = make_updates(users, per_user)
+
+    print(f"Пользователей: {users}, апдейтов: {len(updates)}, задержка обработчика: {delay_ms} мс\n")
+    print(f"{'Лимит':<8}{'апдейтов/с':>14}{'ускорение':>12}{'нарушений порядка':>20}")
+    baseline = None
+    for limit in LIMITS:
+        rate, out_of_order = await run(limit, updates, delay_ms / 1000)
+        baseline = baseline or rate
+        print(f"{limit:<8}{rate:>14.0f}{rate / baseline:>11.1f}x{out_of_order:>20}")
+
+    limit, max_pending, flood, others, delay = 4, 8, 20, 3, 0.1
+    print(f"\nПерекос: лимит {limit}, мест {max_pending}, флудер шлёт {flood} апдейтов "
+          f"по {delay * 1000:.0f} мс, затем {others} пользователя по одному\n")
+    print(f"{'На пользователя':<18}{'остальные готовы, с':>22}{'отброшено':>12}")
+    for max_per_key in (max_pending, 4, 2):
+        others_done, dropped = await run_skewed(limit, max_pending, max_per_key, flood, others, delay)
+        label = f"{max_per_key}" + (" (без огр.)" if max_per_key == max_pending else "")
+        print(f"{label:<18}{others_done:>22.2f}{dropped:>12}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,6 +5,7 @@
 Запуск: python bot.py
 """
 
+import asyncio
 import logging
 import sys
 import traceback
@@ -17,6 +18,8 @@ from telegram.ext import (
     MessageHandler,
     ConversationHandler,
     ContextTypes,
+    TypeHandler,
+    PollAnswerHandler,
     filters,
 )
 
@@ -31,16 +34,27 @@ from config import (
     ADMIN_ADD_QUIZ_ANSWERS, ADMIN_ADD_QUIZ_CORRECT, ADMIN_ADD_QUIZ_MORE,
     ADMIN_ADD_QUEST_TITLE, ADMIN_ADD_QUEST_STEP_TEXT,
     ADMIN_ADD_QUEST_STEP_ANSWER, ADMIN_ADD_QUEST_MORE,
+    ADMIN_BROADCAST_TEXT, ADMIN_BROADCAST_CONFIRM,
     PROFILE_VIEW, LEADERBOARD, FACT_OF_DAY,
     CAREER_TEST, CAREER_TEST_PLAY,
+    SESSION_TIMEOUTS, SESSION_TIMEOUT_MENU, SESSION_SWEEP_INTERVAL,
+    PERSISTENCE_FLUSH_INTERVAL, CONCURRENT_UPDATES, UPDATES_PER_USER_PENDING,
+    BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, PORT, UPDATE_QUEUE_SIZE,
+    WORKERS, SHARD_REFRESH_INTERVAL, SHARD_REPORT_INTERVAL,
+    RATE_LIMIT_GLOBAL, RATE_LIMIT_PER_CHAT, RATE_LIMIT_CHAT_BURST,
+    RATE_LIMIT_BACKGROUND_RESERVE, RATE_LIMIT_MAX_RETRIES,
+    BROADCAST_LEASE_SECONDS, POLL_COUNTS_CHECK_INTERVAL,
+)
+from database import (
+    init_db, seed_default_data, ensure_user,
+    init_pool, close_pool, load_rank_index,
 )
-from database import init_db, seed_default_data, get_or_create_user
 
 from handlers.start import start, back_to_menu, help_command, main_menu_keyboard, WELCOME_TEXT
 from handlers.education import education_menu, topic_sections, section_detail
 from handlers.quiz import quiz_list, quiz_start, quiz_answer, quiz_next
 from handlers.quest import quest_list, quest_begin, quest_hint, quest_answer
-from handlers.polls import poll_list, poll_send
+from handlers.polls import poll_list, poll_send, poll_answer, poll_counts_check
 from handlers.profile import (
     profile, leaderboard, fact_of_day,
     career_test_start, career_next_question, career_answer,
@@ -52,7 +66,19 @@ from handlers.admin import (
     admin_add_quest_start, admin_quest_title,
     admin_quest_step_text, admin_quest_step_answer,
     admin_quest_more, admin_quest_save,
+    admin_broadcast_start, admin_broadcast_text, admin_broadcast_send, broadcast_cancel,
+    admin_poll_results, admin_poll_result, admin_backfill_achievements,
 )
+from sessions import SessionSweeper
+from persistence import SQLitePersistence
+from webhook import serve_webhook
+from concurrency import KeyedUpdateProcessor, AdmissionQueue
+from sharding import ShardRouter, refresh_shared_state
+from ratelimit import TokenBucketRateLimiter
+from broadcast import broadcaster
+from facts import push_daily_fact, push_time
+from streaks import streak_tracker, RESET_TIME
+from routing import CallbackRouter, route
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -63,12 +89,12 @@ logger = logging.getLogger(__name__)
 
 async def reentry_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Re-enter conversation when user clicks a button but has no active state
-    (e.g. after bot restart on Railway)."""
+    (e.g. the conversation expired and was evicted)."""
     query = update.callback_query
     await query.answer()
 
     user = update.effective_user
-    await get_or_create_user(user.id, user.username, user.first_name, user.last_name)
+    await ensure_user(user.id, user.username, user.first_name, user.last_name)
     context.user_data.clear()
 
     try:
@@ -89,7 +115,7 @@ async def reentry_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def reentry_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Re-enter conversation when user sends text but has no active state."""
     user = update.effective_user
-    await get_or_create_user(user.id, user.username, user.first_name, user.last_name)
+    await ensure_user(user.id, user.username, user.first_name, user.last_name)
     context.user_data.clear()
 
     await update.message.reply_text(
@@ -104,117 +130,162 @@ def build_conversation_handler() -> ConversationHandler:
     """Создаёт основной ConversationHandler со всеми состояниями."""
 
     # Общие callback-кнопки навигации, доступные из любого состояния
-    back_to_menu_handler = CallbackQueryHandler(back_to_menu, pattern="^back_to_menu$")
+    back = route(back_to_menu)
+    # Кнопка под сообщением о прогрессе рассылки не меняет состояние диалога.
+    # Она стоит и во входах — раньше перехватчика reentry_callback, — чтобы
+    # сработать и тогда, когда диалог администратора уже вытеснен.
+    broadcast_cancel_router = CallbackRouter({"broadcast_cancel": route(broadcast_cancel, int)})
+    # Команды администратора тоже работают без активного диалога
+    broadcast_command = CommandHandler("broadcast", admin_broadcast_start)
+    backfill_command = CommandHandler("backfill_achievements", admin_backfill_achievements)
 
     return ConversationHandler(
         entry_points=[
             CommandHandler("start", start),
+            broadcast_command,
+            backfill_command,
+            broadcast_cancel_router,
             CallbackQueryHandler(reentry_callback),
             MessageHandler(filters.TEXT & ~filters.COMMAND, reentry_text),
         ],
         states={
             # ── Главное меню ──
             MAIN_MENU: [
-                CallbackQueryHandler(education_menu, pattern="^education$"),
-                CallbackQueryHandler(quiz_list, pattern="^quiz_list$"),
-                CallbackQueryHandler(quiz_start, pattern=r"^quiz_start:\d+$"),
-                CallbackQueryHandler(quest_list, pattern="^quest_list$"),
-                CallbackQueryHandler(quest_begin, pattern=r"^quest_begin:\d+$"),
-                CallbackQueryHandler(poll_list, pattern="^poll_list$"),
-                CallbackQueryHandler(profile, pattern="^profile$"),
-                CallbackQueryHandler(leaderboard, pattern="^leaderboard$"),
-                CallbackQueryHandler(fact_of_day, pattern="^fact_of_day$"),
-                CallbackQueryHandler(career_test_start, pattern="^career_test$"),
-                CallbackQueryHandler(admin_menu, pattern="^admin_menu$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "education": route(education_menu),
+                    "quiz_list": route(quiz_list),
+                    "quiz_start": route(quiz_start, int),
+                    "quest_list": route(quest_list),
+                    "quest_begin": route(quest_begin, int),
+                    "poll_list": route(poll_list),
+                    "profile": route(profile),
+                    "leaderboard": route(leaderboard),
+                    "fact_of_day": route(fact_of_day),
+                    "career_test": route(career_test_start),
+                    "admin_menu": route(admin_menu),
+                    "back_to_menu": back,
+                }),
             ],
 
             # ── Образование ──
             EDUCATION_TOPIC: [
-                CallbackQueryHandler(topic_sections, pattern=r"^edu_topic:"),
-                CallbackQueryHandler(education_menu, pattern="^education$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "edu_topic": route(topic_sections, str),
+                    "education": route(education_menu),
+                    "back_to_menu": back,
+                }),
             ],
             EDUCATION_DETAIL: [
-                CallbackQueryHandler(section_detail, pattern=r"^edu_section:"),
-                CallbackQueryHandler(topic_sections, pattern=r"^edu_topic:"),
-                CallbackQueryHandler(education_menu, pattern="^education$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "edu_section": route(section_detail, str, str),
+                    "edu_topic": route(topic_sections, str),
+                    "education": route(education_menu),
+                    "back_to_menu": back,
+                }),
             ],
 
             # ── Викторины ──
             QUIZ_SELECT: [
-                CallbackQueryHandler(quiz_start, pattern=r"^quiz_start:\d+$"),
-                CallbackQueryHandler(quiz_list, pattern="^quiz_list$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "quiz_start": route(quiz_start, int),
+                    "quiz_list": route(quiz_list),
+                    "back_to_menu": back,
+                }),
             ],
             QUIZ_PLAY: [
-                CallbackQueryHandler(quiz_answer, pattern=r"^quiz_answer:\d+$"),
-                CallbackQueryHandler(quiz_next, pattern="^quiz_next$"),
-                CallbackQueryHandler(quiz_start, pattern=r"^quiz_start:\d+$"),
-                CallbackQueryHandler(quiz_list, pattern="^quiz_list$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "quiz_answer": route(quiz_answer, int),
+                    "quiz_next": route(quiz_next),
+                    "quiz_start": route(quiz_start, int),
+                    "quiz_list": route(quiz_list),
+                    "back_to_menu": back,
+                }),
             ],
 
             # ── Квесты ──
             QUEST_SELECT: [
-                CallbackQueryHandler(quest_begin, pattern=r"^quest_begin:\d+$"),
-                CallbackQueryHandler(quest_list, pattern="^quest_list$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "quest_begin": route(quest_begin, int),
+                    "quest_list": route(quest_list),
+                    "back_to_menu": back,
+                }),
             ],
             QUEST_PLAY: [
-                CallbackQueryHandler(quest_hint, pattern="^quest_hint$"),
-                CallbackQueryHandler(quest_list, pattern="^quest_list$"),
+                CallbackRouter({
+                    "quest_hint": route(quest_hint),
+                    "quest_list": route(quest_list),
+                    "back_to_menu": back,
+                }),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, quest_answer),
-                back_to_menu_handler,
             ],
 
             # ── Опросы ──
             POLL_SELECT: [
-                CallbackQueryHandler(poll_send, pattern=r"^poll_send:\d+$"),
-                CallbackQueryHandler(poll_list, pattern="^poll_list$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "poll_send": route(poll_send, int),
+                    "poll_list": route(poll_list),
+                    "back_to_menu": back,
+                }),
             ],
             POLL_ANSWER: [
-                CallbackQueryHandler(poll_list, pattern="^poll_list$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "poll_list": route(poll_list),
+                    "back_to_menu": back,
+                }),
             ],
 
             # ── Профиль ──
             PROFILE_VIEW: [
-                CallbackQueryHandler(leaderboard, pattern="^leaderboard$"),
-                CallbackQueryHandler(profile, pattern="^profile$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "leaderboard": route(leaderboard),
+                    "profile": route(profile),
+                    "back_to_menu": back,
+                }),
             ],
             LEADERBOARD: [
-                CallbackQueryHandler(profile, pattern="^profile$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "profile": route(profile),
+                    "back_to_menu": back,
+                }),
             ],
 
             # ── Факт дня ──
             FACT_OF_DAY: [
-                CallbackQueryHandler(fact_of_day, pattern="^fact_of_day$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "fact_of_day": route(fact_of_day),
+                    "fact_more": route(fact_of_day),
+                    "fact_subscribe": route(fact_of_day),
+                    "back_to_menu": back,
+                }),
             ],
 
             # ── Профориентация ──
             CAREER_TEST: [
-                CallbackQueryHandler(career_next_question, pattern="^career_next$"),
-                CallbackQueryHandler(career_test_start, pattern="^career_test$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "career_next": route(career_next_question),
+                    "career_test": route(career_test_start),
+                    "back_to_menu": back,
+                }),
             ],
             CAREER_TEST_PLAY: [
-                CallbackQueryHandler(career_answer, pattern=r"^career_ans:\d+$"),
-                CallbackQueryHandler(career_test_start, pattern="^career_test$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "career_ans": route(career_answer, int),
+                    "career_test": route(career_test_start),
+                    "back_to_menu": back,
+                }),
             ],
 
             # ── Админка ──
             ADMIN_MENU: [
-                CallbackQueryHandler(admin_add_quiz_start, pattern="^admin_add_quiz$"),
-                CallbackQueryHandler(admin_add_quest_start, pattern="^admin_add_quest$"),
-                CallbackQueryHandler(admin_menu, pattern="^admin_menu$"),
-                back_to_menu_handler,
+                CallbackRouter({
+                    "admin_add_quiz": route(admin_add_quiz_start),
+                    "admin_add_quest": route(admin_add_quest_start),
+                    "admin_broadcast": route(admin_broadcast_start),
+                    "admin_polls": route(admin_poll_results),
+                    "admin_poll": route(admin_poll_result, int),
+                    "admin_menu": route(admin_menu),
+                    "back_to_menu": back,
+                }),
             ],
             ADMIN_ADD_QUIZ_TITLE: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, admin_quiz_title),
@@ -229,8 +300,10 @@ def build_conversation_handler() -> ConversationHandler:
                 MessageHandler(filters.TEXT & ~filters.COMMAND, admin_quiz_correct),
             ],
             ADMIN_ADD_QUIZ_MORE: [
-                CallbackQueryHandler(admin_quiz_more, pattern="^admin_quiz_more$"),
-                CallbackQueryHandler(admin_quiz_save, pattern="^admin_quiz_save$"),
+                CallbackRouter({
+                    "admin_quiz_more": route(admin_quiz_more),
+                    "admin_quiz_save": route(admin_quiz_save),
+                }),
             ],
             ADMIN_ADD_QUEST_TITLE: [
                 MessageHandler(filters.TEXT & ~filters.COMMAND, admin_quest_title),
@@ -242,8 +315,19 @@ def build_conversation_handler() -> ConversationHandler:
                 MessageHandler(filters.TEXT & ~filters.COMMAND, admin_quest_step_answer),
             ],
             ADMIN_ADD_QUEST_MORE: [
-                CallbackQueryHandler(admin_quest_more, pattern="^admin_quest_more$"),
-                CallbackQueryHandler(admin_quest_save, pattern="^admin_quest_save$"),
+                CallbackRouter({
+                    "admin_quest_more": route(admin_quest_more),
+                    "admin_quest_save": route(admin_quest_save),
+                }),
+            ],
+            ADMIN_BROADCAST_TEXT: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, admin_broadcast_text),
+            ],
+            ADMIN_BROADCAST_CONFIRM: [
+                CallbackRouter({
+                    "admin_broadcast_send": route(admin_broadcast_send),
+                    "admin_menu": route(admin_menu),
+                }),
             ],
         },
         fallbacks=[
@@ -255,19 +339,35 @@ def build_conversation_handler() -> ConversationHandler:
             CommandHandler("fact", lambda u, c: fact_of_day(u, c)),
             CommandHandler("career", lambda u, c: career_test_start(u, c)),
             CommandHandler("admin", lambda u, c: admin_menu(u, c)),
+            broadcast_command,
+            backfill_command,
+            broadcast_cancel_router,
         ],
         per_message=False,
+        name="main",
+        persistent=True,
     )
 
 
 async def post_init(application):
     """Инициализация БД и загрузка данных при старте."""
     logger.info("Инициализация базы данных...")
+    await init_pool()
     await init_db()
     await seed_default_data()
+    await load_rank_index()
     logger.info("База данных готова. Бот запущен!")
+    await set_bot_commands(application.bot)
+
 
-    # Установка команд бота
+async def post_init_worker(application):
+    """Воркер шарда: схему уже подготовил фронт, нужны только соединения и рейтинг."""
+    await init_pool()
+    await load_rank_index()
+
+
+async def set_bot_commands(bot):
+    """Установка команд бота."""
     from telegram import BotCommand
     commands = [
         BotCommand("start", "Главное меню"),
@@ -278,7 +378,14 @@ async def post_init(application):
         BotCommand("fact", "Факт дня"),
         BotCommand("career", "Тест на профессию"),
     ]
-    await application.bot.set_my_commands(commands)
+    await bot.set_my_commands(commands)
+
+
+async def post_shutdown(application):
+    """Закрытие соединений с БД при остановке бота."""
+    # Рассылки сохраняют позицию, пока писатель БД ещё работает
+    await broadcaster.stop()
+    await close_pool()
 
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
@@ -294,26 +401,159 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
             pass
 
 
-def main():
-    if not BOT_TOKEN:
-        print("ОШИБКА: Не задан BOT_TOKEN!")
-        print("Создайте файл .env с содержимым:")
-        print("  BOT_TOKEN=ваш_токен_от_BotFather")
-        sys.exit(1)
+def build_rate_limiter() -> TokenBucketRateLimiter:
+    # Общий лимит Telegram считается на бота, поэтому воркеры делят его поровну
+    return TokenBucketRateLimiter(
+        global_rate=RATE_LIMIT_GLOBAL / max(WORKERS, 1),
+        chat_rate=RATE_LIMIT_PER_CHAT,
+        chat_burst=RATE_LIMIT_CHAT_BURST,
+        background_reserve=RATE_LIMIT_BACKGROUND_RESERVE / max(WORKERS, 1),
+        max_retries=RATE_LIMIT_MAX_RETRIES,
+    )
 
-    application = (
+
+def build_application(init=post_init, with_updater: bool = True,
+                      singleton_jobs: bool = True) -> Application:
+    """Application с основным диалогом, хранением состояния и чисткой сессий.
+
+    ``singleton_jobs`` — запускать ли задачи, которые работают со всей базой
+    сразу; при шардировании они нужны только в одном процессе.
+    """
+    # Брошенное дольше самого длинного таймаута состояние не восстанавливаем
+    max_session_age = max(SESSION_TIMEOUT_MENU, *SESSION_TIMEOUTS.values())
+    persistence = SQLitePersistence(update_interval=PERSISTENCE_FLUSH_INTERVAL, max_age=max_session_age)
+    # Разные пользователи — параллельно, один пользователь — по порядку
+    processor = KeyedUpdateProcessor(CONCURRENT_UPDATES, max_per_key=UPDATES_PER_USER_PENDING)
+
+    builder = (
         Application.builder()
         .token(BOT_TOKEN)
-        .post_init(post_init)
-        .build()
+        .persistence(persistence)
+        # Апдейт покидает очередь, только когда процессору есть куда его взять
+        .update_queue(AdmissionQueue(UPDATE_QUEUE_SIZE, processor))
+        .concurrent_updates(processor)
+        .rate_limiter(build_rate_limiter())
+        .post_init(init)
+        .post_shutdown(post_shutdown)
     )
+    if not with_updater:
+        builder = builder.updater(None)
+    application = builder.build()
 
     conv_handler = build_conversation_handler()
     application.add_handler(conv_handler)
+    # Ответы на опросы приходят отдельными апдейтами без чата
+    application.add_handler(PollAnswerHandler(poll_answer))
     application.add_error_handler(error_handler)
 
-    logger.info("Запуск бота в режиме Long Polling...")
-    application.run_polling(drop_pending_updates=True, allowed_updates=Update.ALL_TYPES)
+    # Состояние пользователя из БД подгружается при его первом апдейте
+    application.add_handler(TypeHandler(Update, persistence.preload), group=-2)
+
+    # Серия дней подряд: первый апдейт пользователя за день
+    application.add_handler(TypeHandler(Update, streak_tracker.track), group=-3)
+
+    # Вытеснение брошенных сессий и диалогов
+    sweeper = SessionSweeper(
+        conv_handler, SESSION_TIMEOUTS, SESSION_TIMEOUT_MENU, persistence=persistence
+    )
+    application.add_handler(TypeHandler(Update, sweeper.track), group=-1)
+    application.job_queue.run_repeating(
+        sweeper.sweep, interval=SESSION_SWEEP_INTERVAL, first=SESSION_SWEEP_INTERVAL,
+        name="session_sweep",
+    )
+    if singleton_jobs:
+        schedule_singleton_jobs(application.job_queue)
+    return application
+
+
+def schedule_singleton_jobs(job_queue):
+    """Задачи на всю базу: в нескольких процессах они выполнялись бы по разу в каждом."""
+    job_queue.run_daily(streak_tracker.reset, time=RESET_TIME, name="streak_reset")
+    # Рассылки, прерванные рестартом или падением другого процесса
+    job_queue.run_repeating(
+        broadcaster.resume, interval=BROADCAST_LEASE_SECONDS / 2, first=5,
+        name="broadcast_resume",
+    )
+    # Факт дня подписчикам; разовый запуск догоняет рассылку, пропущенную из-за простоя
+    job_queue.run_daily(push_daily_fact, time=push_time, name="fact_push")
+    job_queue.run_once(push_daily_fact, when=10, name="fact_push_catchup")
+    job_queue.run_repeating(
+        poll_counts_check, interval=POLL_COUNTS_CHECK_INTERVAL, first=POLL_COUNTS_CHECK_INTERVAL,
+        name="poll_counts_check",
+    )
+
+
+def build_worker_application(shard: int) -> Application:
+    """Воркер шарда: апдейты приходят от фронта, а не из Telegram."""
+    application = build_application(
+        init=post_init_worker, with_updater=False, singleton_jobs=shard == 0
+    )
+    application.job_queue.run_repeating(
+        refresh_shared_state, interval=SHARD_REFRESH_INTERVAL, first=SHARD_REFRESH_INTERVAL,
+        name="shard_refresh",
+    )
+    return application
+
+
+def build_front_application(router: ShardRouter) -> Application:
+    """Фронт: принимает апдейты и раскладывает их по воркерам."""
+
+    async def front_post_init(application):
+        logger.info("Инициализация базы данных...")
+        await init_db()
+        await seed_default_data()
+        await set_bot_commands(application.bot)
+        # Воркеры стартуют после миграций, чтобы не применять их наперегонки
+        router.start()
+
+    async def front_post_shutdown(application):
+        await router.stop()
+
+    application = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .update_queue(asyncio.Queue(maxsize=UPDATE_QUEUE_SIZE))
+        .post_init(front_post_init)
+        .post_shutdown(front_post_shutdown)
+        .build()
+    )
+    application.add_handler(TypeHandler(Update, router.route))
+    application.job_queue.run_repeating(
+        router.report, interval=SHARD_REPORT_INTERVAL, first=SHARD_REPORT_INTERVAL,
+        name="shard_report",
+    )
+    return application
+
+
+def main():
+    if not BOT_TOKEN:
+        print("ОШИБКА: Не задан BOT_TOKEN!")
+        print("Создайте файл .env с содержимым:")
+        print("  BOT_TOKEN=ваш_токен_от_BotFather")
+        sys.exit(1)
+
+    if RATE_LIMIT_GLOBAL / max(WORKERS, 1) < 1:
+        # Каждому воркеру достаётся своя доля общего лимита Telegram
+        print(f"ОШИБКА: RATE_LIMIT_GLOBAL={RATE_LIMIT_GLOBAL:g} на WORKERS={WORKERS} — "
+              "меньше одного сообщения в секунду на воркер.")
+        print("Уменьшите WORKERS или увеличьте RATE_LIMIT_GLOBAL.")
+        sys.exit(1)
+
+    if WORKERS > 1:
+        router = ShardRouter(build_worker_application, WORKERS, UPDATE_QUEUE_SIZE)
+        application = build_front_application(router)
+    else:
+        application = build_application()
+
+    if BOT_MODE == "webhook":
+        logger.info("Запуск бота в режиме Webhook...")
+        asyncio.run(serve_webhook(
+            application, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+            port=PORT, allowed_updates=Update.ALL_TYPES,
+        ))
+    else:
+        logger.info("Запуск бота в режиме Long Polling...")
+        application.run_polling(drop_pending_updates=True, allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
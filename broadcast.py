@@ -0,0 +1,222 @@
+"""Рассылки сообщений всем пользователям.
+
+Получатели читаются из ``users`` порциями по ``BROADCAST_CHUNK_SIZE`` в
+порядке user_id — таблица целиком в память не попадает. Сообщения уходят
+через фоновую полосу лимитера (``ratelimit.BACKGROUND``), поэтому ответы
+пользователям во время рассылки не тормозят. После каждой порции в БД
+сохраняется контрольная точка: после рестарта рассылка продолжится со
+следующего получателя (порция, прерванная посередине, может дойти повторно).
+Заблокировавшие бота отмечаются в ``users.blocked_at`` и дальше пропускаются.
+
+Рассылка идёт по аудитории (все пользователи или подписчики факта дня)
+и может быть растянута на окно времени — тогда порции отправляются
+равномерно, а не разом.
+
+Рассылку ведёт процесс, взявший её в аренду; ``resume`` периодически
+подхватывает рассылки с истёкшей арендой — после рестарта или падения
+воркера.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, TelegramError
+from telegram.ext import ContextTypes
+
+from config import (
+    BROADCAST_CHUNK_SIZE, BROADCAST_LEASE_SECONDS, BROADCAST_PROGRESS_INTERVAL,
+)
+from database import (
+    create_broadcast, claim_broadcast, get_broadcast_recipients,
+    save_broadcast_progress, release_broadcast, count_reachable_users,
+)
+from ratelimit import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+SENT, FAILED, BLOCKED = range(3)
+
+
+def format_progress(b: dict) -> str:
+    processed = b["sent"] + b["failed"] + b["blocked"]
+    rate = processed / b["elapsed"] if b["elapsed"] > 0 else 0
+    if b["status"] == "done":
+        header = "✅ <b>Рассылка завершена</b>"
+    elif b["status"] == "cancelled":
+        header = "⏹ <b>Рассылка остановлена</b>"
+    else:
+        header = "\U0001f4e3 <b>Идёт рассылка</b>"
+
+    text = (
+        f"{header}\n\n"
+        f"Отправлено: <b>{b['sent']}</b> из {b['total']}\n"
+        f"Заблокировали бота: {b['blocked']}\n"
+        f"Ошибок: {b['failed']}\n"
+        f"Скорость: {rate:.1f} сообщ./с"
+    )
+    if b["status"] == "running" and rate > 0:
+        remaining = max(b["total"] - processed, 0)
+        text += f"\nОсталось: ~{_format_duration(remaining / rate)}"
+    return text
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds} с"
+    if seconds < 3600:
+        return f"{seconds // 60} мин"
+    return f"{seconds // 3600} ч {seconds % 3600 // 60} мин"
+
+
+def progress_keyboard(b: dict):
+    if b["status"] != "running":
+        return None
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton("⏹ Остановить", callback_data=f"broadcast_cancel:{b['id']}")
+    ]])
+
+
+class Broadcaster:
+    def __init__(self, chunk_size: int, lease_seconds: int, progress_interval: int):
+        self.chunk_size = chunk_size
+        self.lease_seconds = lease_seconds
+        self.progress_interval = progress_interval
+        # Уникален для процесса: по нему БД знает, кто ведёт рассылку
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._tasks = {}
+        self._stopping = False
+
+    async def start(self, bot, text: str, created_by: int = None, status_message=None,
+                    audience: str = "all", window: float = 0, job_run: tuple = None):
+        """Создаёт рассылку и сразу начинает её в этом процессе.
+
+        ``window`` — за сколько секунд равномерно разослать всем (0 — как
+        позволяет лимитер). ``job_run`` — см. ``database.create_broadcast``;
+        None в ответ значит, что за эту дату рассылка уже создана.
+        """
+        pace = 0
+        if window > 0:
+            recipients = await count_reachable_users(audience)
+            chunks = max(1, -(-recipients // self.chunk_size))
+            # Пауза между порциями не дольше половины аренды, иначе её перехватят
+            pace = min(window / chunks, self.lease_seconds / 2)
+        b = await create_broadcast(
+            text, created_by, self.owner, self.lease_seconds,
+            status_message.chat_id if status_message else None,
+            status_message.message_id if status_message else None,
+            audience=audience, pace=pace, job_run=job_run,
+        )
+        if b is None:
+            return None
+        self._spawn(bot, b)
+        return b
+
+    async def resume(self, context: ContextTypes.DEFAULT_TYPE):
+        """Задача JobQueue: подхватывает брошенные рассылки."""
+        if self._stopping:
+            return
+        while (b := await claim_broadcast(self.owner, self.lease_seconds)) is not None:
+            logger.info("Продолжаем рассылку #%d с user_id > %d", b["id"], b["last_user_id"])
+            self._spawn(context.bot, b)
+
+    def _spawn(self, bot, b: dict):
+        task = asyncio.create_task(self._run(bot, b), name=f"broadcast-{b['id']}")
+        self._tasks[b["id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(b["id"], None))
+
+    async def stop(self, timeout: float = 10):
+        """Даёт текущим порциям дойти, затем отпускает аренду."""
+        self._stopping = True
+        tasks = list(self._tasks.values())
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _send(self, bot, user_id: int, text: str) -> int:
+        try:
+            await bot.send_message(user_id, text, rate_limit_args=BACKGROUND)
+            return SENT
+        except Forbidden:
+            return BLOCKED
+        except BadRequest as exc:
+            if "chat not found" in str(exc).lower():
+                return BLOCKED
+            logger.warning("Рассылка: не удалось отправить %s: %s", user_id, exc)
+            return FAILED
+        except TelegramError as exc:
+            logger.warning("Рассылка: не удалось отправить %s: %s", user_id, exc)
+            return FAILED
+
+    async def _run(self, bot, b: dict):
+        last_report = time.monotonic()
+        try:
+            while not self._stopping:
+                started = time.monotonic()
+                recipients = await get_broadcast_recipients(
+                    b["audience"], b["last_user_id"], self.chunk_size
+                )
+                if not recipients:
+                    if await save_broadcast_progress(
+                        b["id"], self.owner, b["last_user_id"], 0, 0, (), 0,
+                        self.lease_seconds, finished=True,
+                    ):
+                        b["status"] = "done"
+                        await self._report(bot, b)
+                    return
+
+                results = await asyncio.gather(
+                    *(self._send(bot, user_id, b["text"]) for user_id in recipients)
+                )
+                sent = results.count(SENT)
+                failed = results.count(FAILED)
+                blocked = [uid for uid, r in zip(recipients, results) if r == BLOCKED]
+                elapsed = time.monotonic() - started
+
+                if not await save_broadcast_progress(
+                    b["id"], self.owner, recipients[-1], sent, failed, blocked, elapsed,
+                    self.lease_seconds,
+                ):
+                    logger.info("Рассылка #%d отменена или перехвачена, останавливаемся", b["id"])
+                    return
+                b["last_user_id"] = recipients[-1]
+                b["sent"] += sent
+                b["failed"] += failed
+                b["blocked"] += len(blocked)
+                b["elapsed"] += elapsed
+
+                if time.monotonic() - last_report >= self.progress_interval:
+                    last_report = time.monotonic()
+                    await self._report(bot, b)
+                # Растягиваем рассылку на окно, а не отправляем всё в одну секунду
+                if b["pace"] > elapsed:
+                    await asyncio.sleep(b["pace"] - elapsed)
+        except Exception:
+            logger.exception("Рассылка #%d прервана ошибкой", b["id"])
+        finally:
+            if b["status"] == "running":
+                # Следующий владелец (или рестарт) продолжит с контрольной точки
+                await release_broadcast(b["id"], self.owner)
+
+    async def _report(self, bot, b: dict):
+        if not b["status_chat_id"]:
+            return
+        try:
+            await bot.edit_message_text(
+                format_progress(b),
+                chat_id=b["status_chat_id"],
+                message_id=b["status_message_id"],
+                reply_markup=progress_keyboard(b),
+                parse_mode="HTML",
+            )
+        except TelegramError as exc:
+            logger.debug("Не удалось обновить прогресс рассылки #%d: %s", b["id"], exc)
+
+
+broadcaster = Broadcaster(BROADCAST_CHUNK_SIZE, BROADCAST_LEASE_SECONDS, BROADCAST_PROGRESS_INTERVAL)
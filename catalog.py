@@ -0,0 +1,205 @@
+"""Каталог викторин и квестов в памяти.
+
+Викторины и квесты загружаются из БД один раз и разбираются в неизменяемые
+объекты с заранее посчитанным числом вопросов/этапов. Каталог
+перечитывается только когда ``database.content_version()`` меняется, то есть
+после ``add_quiz`` / ``add_quest`` — списки и старт игры не трогают ни
+SQLite, ни JSON-парсер.
+
+Игровые сессии хранят только id и ``revision`` определения — хэш его
+исходной строки в БД, поэтому ревизия одна и та же после рестарта и во
+всех процессах, и восстановленная из persistence сессия находит своё
+определение. Если викторину или квест изменили посреди игры, прежнее
+определение остаётся доступным через ``quiz_revision`` /
+``quest_revision``, пока сессию не доиграют (в пределах ``RETIRED_LIMIT``
+последних использованных ревизий).
+"""
+
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import database
+
+# Сколько заменённых определений держать для недоигранных сессий. Те, по
+# которым ещё играют, при каждом обращении уходят в конец очереди, поэтому
+# вытесняются давно никому не нужные ревизии.
+RETIRED_LIMIT = 256
+
+
+@dataclass(frozen=True)
+class Question:
+    text: str
+    options: tuple
+    correct: int
+    explanation: str = ""
+
+
+@dataclass(frozen=True)
+class Quiz:
+    id: int
+    revision: int
+    title: str
+    description: str
+    questions: tuple
+    question_count: int
+
+
+@dataclass(frozen=True)
+class QuestStep:
+    text: str
+    answer: str
+    hint: str = ""
+
+
+@dataclass(frozen=True)
+class Quest:
+    id: int
+    revision: int
+    title: str
+    description: str
+    steps: tuple
+    step_count: int
+    reward_points: int
+
+
+def _parse_quiz(row: dict, revision: int) -> Quiz:
+    questions = tuple(
+        Question(
+            text=q["text"],
+            options=tuple(q["options"]),
+            correct=q["correct"],
+            explanation=q.get("explanation") or "",
+        )
+        for q in json.loads(row["questions"])
+    )
+    return Quiz(
+        id=row["id"],
+        revision=revision,
+        title=row["title"],
+        description=row["description"] or "",
+        questions=questions,
+        question_count=len(questions),
+    )
+
+
+def _parse_quest(row: dict, revision: int) -> Quest:
+    steps = tuple(
+        QuestStep(text=s["text"], answer=s["answer"], hint=s.get("hint") or "")
+        for s in json.loads(row["steps"])
+    )
+    return Quest(
+        id=row["id"],
+        revision=revision,
+        title=row["title"],
+        description=row["description"] or "",
+        steps=steps,
+        step_count=len(steps),
+        reward_points=row["reward_points"],
+    )
+
+
+def _quiz_source(row: dict) -> tuple:
+    return row["title"], row["description"], row["questions"]
+
+
+def _quest_source(row: dict) -> tuple:
+    return row["title"], row["description"], row["steps"], row["reward_points"]
+
+
+def _revision(source: tuple) -> int:
+    """Ревизия определения: стабильный хэш его исходных полей."""
+    digest = hashlib.blake2b(
+        json.dumps(source, ensure_ascii=False).encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "big")
+
+
+class _Section:
+    """Определения одного вида (викторины или квесты) и их прежние ревизии."""
+
+    def __init__(self, parse, source):
+        self._parse = parse
+        self._source = source
+        self.items = {}
+        self._sources = {}
+        # (id, revision) -> определение, заменённое во время чьей-то игры (LRU)
+        self._retired = OrderedDict()
+
+    def reload(self, rows):
+        items, sources = {}, {}
+        for row in rows:
+            item_id, source = row["id"], self._source(row)
+            if self._sources.get(item_id) == source:
+                # Не изменилось — сохраняем объект и его ревизию
+                items[item_id] = self.items[item_id]
+            else:
+                items[item_id] = self._parse(row, _revision(source))
+            sources[item_id] = source
+        for item_id, old in self.items.items():
+            if items.get(item_id) is not old:
+                self._retired[(item_id, old.revision)] = old
+        while len(self._retired) > RETIRED_LIMIT:
+            self._retired.popitem(last=False)
+        self.items, self._sources = items, sources
+
+    def get_revision(self, item_id: int, revision: int):
+        current = self.items.get(item_id)
+        if current is not None and current.revision == revision:
+            return current
+        key = (item_id, revision)
+        old = self._retired.get(key)
+        if old is not None:
+            self._retired.move_to_end(key)
+        return old
+
+
+class ContentCatalog:
+    def __init__(self):
+        self._version = None
+        self._quizzes = _Section(_parse_quiz, _quiz_source)
+        self._quests = _Section(_parse_quest, _quest_source)
+        self._lock = asyncio.Lock()
+
+    async def _ensure_fresh(self):
+        if self._version == database.content_version():
+            return
+        async with self._lock:
+            version = database.content_version()
+            if self._version == version:
+                return
+            quiz_rows = await database.get_all_quizzes()
+            quest_rows = await database.get_all_quests()
+            self._quizzes.reload(quiz_rows)
+            self._quests.reload(quest_rows)
+            self._version = version
+
+    async def quizzes(self) -> tuple:
+        await self._ensure_fresh()
+        return tuple(self._quizzes.items.values())
+
+    async def quiz(self, quiz_id: int):
+        await self._ensure_fresh()
+        return self._quizzes.items.get(quiz_id)
+
+    async def quiz_revision(self, quiz_id: int, revision: int):
+        """Определение, с которым была начата игра, или None, если его уже нет."""
+        await self._ensure_fresh()
+        return self._quizzes.get_revision(quiz_id, revision)
+
+    async def quests(self) -> tuple:
+        await self._ensure_fresh()
+        return tuple(self._quests.items.values())
+
+    async def quest(self, quest_id: int):
+        await self._ensure_fresh()
+        return self._quests.items.get(quest_id)
+
+    async def quest_revision(self, quest_id: int, revision: int):
+        await self._ensure_fresh()
+        return self._quests.get_revision(quest_id, revision)
+
+
+catalog = ContentCatalog()
@@ -0,0 +1,134 @@
+"""Параллельная обработка апдейтов с сохранением порядка для каждого пользователя.
+
+Апдейты разных пользователей обрабатываются одновременно (не больше
+``max_concurrent_updates`` сразу), а апдейты одного пользователя — строго
+по очереди, в порядке поступления: иначе, например, ``quiz_answer`` и
+``quiz_next`` одного игрока гонялись бы за общую сессию.
+
+Application с параллельной обработкой забирает апдейты из ``update_queue``
+не дожидаясь их обработки — по задаче на апдейт, — так что сам по себе
+``maxsize`` очереди ничего не ограничивает. ``AdmissionQueue`` отдаёт
+апдейт только после того, как процессор выделил ему место
+(``max_pending`` на всех), поэтому лишние апдейты остаются в ограниченной
+очереди: webhook отвечает 503, шард придерживает приём. Одному
+пользователю достаётся не больше ``max_per_key`` мест, его апдейты сверх
+этого отбрасываются — иначе засыпающий бота нажатиями пользователь занял
+бы все места, и апдейты остальных ждали бы его очереди.
+
+Замер — ``python -m benchmarks.update_processing``.
+"""
+
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class _KeyLock:
+    __slots__ = ("lock", "holders")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.holders = 0
+
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """Очередь на пользователя (или чат) плюс общий лимит одновременных апдейтов.
+
+    Каждый апдейт сначала получает место через ``admit`` (это делает
+    ``AdmissionQueue``) и держит его до конца обработки; мест
+    ``max_pending``, включая ждущих своей очереди. Лимит одновременной
+    обработки занимается только после блокировки пользователя, а ждущих
+    у одного пользователя не больше ``max_per_key``.
+    """
+
+    def __init__(self, max_concurrent_updates: int, max_pending: int = None,
+                 max_per_key: int = 8):
+        max_pending = max_pending or max_concurrent_updates * 8
+        super().__init__(max_pending)
+        self.limit = max_concurrent_updates
+        self.max_per_key = max(1, max_per_key)
+        self._admitted = asyncio.Semaphore(max_pending)
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        self._locks = {}
+        self.dropped = 0
+
+    async def admit(self):
+        """Ждёт свободного места для следующего апдейта."""
+        await self._admitted.acquire()
+
+    def release(self):
+        self._admitted.release()
+
+    @staticmethod
+    def key(update: object):
+        """Ключ упорядочивания: пользователь, а без него — чат."""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return ("user", update.effective_user.id)
+        if update.effective_chat is not None:
+            return ("chat", update.effective_chat.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        try:
+            await self._process(update, coroutine)
+        finally:
+            self.release()
+
+    async def _process(self, update: object, coroutine) -> None:
+        key = self.key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = _KeyLock()
+        elif entry.holders >= self.max_per_key:
+            coroutine.close()
+            self.dropped += 1
+            logger.warning("Апдейт %s отброшен: у %s уже %d в очереди",
+                           getattr(update, "update_id", None), key, entry.holders)
+            return
+        entry.holders += 1
+        try:
+            async with entry.lock:
+                async with self._running:
+                    await coroutine
+        finally:
+            entry.holders -= 1
+            if not entry.holders:
+                del self._locks[key]
+
+    @property
+    def active_keys(self) -> int:
+        """Пользователи и чаты, у которых есть апдейт в работе или в очереди."""
+        return len(self._locks)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class AdmissionQueue(asyncio.Queue):
+    """``update_queue``, отдающая апдейт только при свободном месте в процессоре."""
+
+    def __init__(self, maxsize: int, processor: KeyedUpdateProcessor):
+        super().__init__(maxsize)
+        self.processor = processor
+
+    async def get(self):
+        await self.processor.admit()
+        try:
+            return await super().get()
+        except BaseException:
+            self.processor.release()
+            raise
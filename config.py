@@ -9,6 +9,78 @@ ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x.strip()]
 DB_PATH = os.path.join(os.path.dirname(__file__), "data", "bot.db")
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
+# Количество долгоживущих соединений с SQLite
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+
+# Отложенная запись (last_active, ответы на опросы): сброс раз в N мс или после M изменений
+COUNTER_FLUSH_INTERVAL_MS = int(os.getenv("COUNTER_FLUSH_INTERVAL_MS", "1000"))
+COUNTER_FLUSH_MAX_EVENTS = int(os.getenv("COUNTER_FLUSH_MAX_EVENTS", "500"))
+
+# Сколько известных пользователей помнить в памяти и как часто (с)
+# обновлять их last_active при повторных входах
+KNOWN_USERS_CACHE_SIZE = int(os.getenv("KNOWN_USERS_CACHE_SIZE", "50000"))
+USER_ACTIVE_REFRESH_SECONDS = int(os.getenv("USER_ACTIVE_REFRESH_SECONDS", "300"))
+
+# Состояние диалогов сохраняется в БД пачкой раз в N секунд
+PERSISTENCE_FLUSH_INTERVAL = int(os.getenv("PERSISTENCE_FLUSH_INTERVAL", "30"))
+
+# Сколько апдейтов разных пользователей обрабатывается одновременно
+CONCURRENT_UPDATES = int(os.getenv("CONCURRENT_UPDATES", "32"))
+# Сколько апдейтов одного пользователя может ждать обработки; лишние отбрасываются
+UPDATES_PER_USER_PENDING = int(os.getenv("UPDATES_PER_USER_PENDING", "8"))
+
+# Число процессов-воркеров (1 — без шардирования). Апдейты делятся по user_id
+WORKERS = int(os.getenv("WORKERS", "1"))
+# Как часто воркеры перечитывают общий рейтинг и контент и фронт пишет длину очередей
+SHARD_REFRESH_INTERVAL = int(os.getenv("SHARD_REFRESH_INTERVAL", "30"))
+SHARD_REPORT_INTERVAL = int(os.getenv("SHARD_REPORT_INTERVAL", "60"))
+
+# Лимиты исходящих сообщений в Telegram (в секунду): на бота и на один чат.
+# Фоновые рассылки не трогают резерв общего лимита, оставленный для ответов.
+# Общий лимит делится между WORKERS и должен давать каждому от 1 в секунду
+RATE_LIMIT_GLOBAL = float(os.getenv("RATE_LIMIT_GLOBAL", "30"))
+RATE_LIMIT_PER_CHAT = float(os.getenv("RATE_LIMIT_PER_CHAT", "1"))
+RATE_LIMIT_CHAT_BURST = int(os.getenv("RATE_LIMIT_CHAT_BURST", "3"))
+RATE_LIMIT_BACKGROUND_RESERVE = int(os.getenv("RATE_LIMIT_BACKGROUND_RESERVE", "10"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+
+# Рассылки: размер порции получателей, аренда рассылки процессом (с)
+# и как часто обновлять сообщение с прогрессом (с)
+BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", "100"))
+BROADCAST_LEASE_SECONDS = int(os.getenv("BROADCAST_LEASE_SECONDS", "120"))
+BROADCAST_PROGRESS_INTERVAL = int(os.getenv("BROADCAST_PROGRESS_INTERVAL", "10"))
+
+# Ежедневная рассылка факта дня подписчикам: часовой пояс, время (ЧЧ:ММ)
+# и окно в минутах, на которое растягивается отправка
+TIMEZONE = os.getenv("TIMEZONE", "Europe/Moscow")
+FACT_PUSH_TIME = os.getenv("FACT_PUSH_TIME", "10:00")
+FACT_PUSH_WINDOW_MINUTES = int(os.getenv("FACT_PUSH_WINDOW_MINUTES", "30"))
+# Сколько минут после FACT_PUSH_TIME бот, запущенный позже, ещё догоняет
+# пропущенную рассылку; после этого факт за день уже не рассылается
+FACT_PUSH_CATCHUP_MINUTES = int(os.getenv("FACT_PUSH_CATCHUP_MINUTES", "120"))
+
+# Как часто сверять счётчики результатов опросов с самими ответами (с)
+POLL_COUNTS_CHECK_INTERVAL = int(os.getenv("POLL_COUNTS_CHECK_INTERVAL", "3600"))
+
+# Для скольких пользователей держать в памяти счётчики достижений
+ACHIEVEMENT_CACHE_SIZE = int(os.getenv("ACHIEVEMENT_CACHE_SIZE", "10000"))
+
+# Готовые экраны профиля и рейтинга: сколько держать в памяти
+# и сколько секунд показывать общий топ без пересборки
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "5000"))
+LEADERBOARD_CACHE_TTL = int(os.getenv("LEADERBOARD_CACHE_TTL", "5"))
+
+# Режим получения апдейтов: polling или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+# Секрет для заголовка X-Telegram-Bot-Api-Secret-Token: 1–256 символов
+# из A-Z, a-z, 0-9, _ и -, иначе Telegram отклонит setWebhook
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+PORT = int(os.getenv("PORT", "8080"))
+# Сколько принятых, но ещё не обработанных апдейтов держим в памяти
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+
 # Состояния для ConversationHandler
 (
     MAIN_MENU,
@@ -35,4 +107,36 @@ DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
     FACT_OF_DAY,
     CAREER_TEST,
     CAREER_TEST_PLAY,
-) = range(24)
+    ADMIN_BROADCAST_TEXT,
+    ADMIN_BROADCAST_CONFIRM,
+) = range(26)
+
+# Таймауты простоя по состояниям диалога (секунды). Брошенные сессии
+# и записи ConversationHandler удаляются периодической чисткой.
+SESSION_TIMEOUT_MENU = int(os.getenv("SESSION_TIMEOUT_MENU", "3600"))
+SESSION_TIMEOUT_QUIZ = int(os.getenv("SESSION_TIMEOUT_QUIZ", "1800"))
+SESSION_TIMEOUT_QUEST = int(os.getenv("SESSION_TIMEOUT_QUEST", "7200"))
+SESSION_TIMEOUT_CAREER = int(os.getenv("SESSION_TIMEOUT_CAREER", "1800"))
+SESSION_TIMEOUT_ADMIN = int(os.getenv("SESSION_TIMEOUT_ADMIN", "7200"))
+SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "300"))
+
+SESSION_TIMEOUTS = {
+    QUIZ_SELECT: SESSION_TIMEOUT_QUIZ,
+    QUIZ_PLAY: SESSION_TIMEOUT_QUIZ,
+    QUEST_SELECT: SESSION_TIMEOUT_QUEST,
+    QUEST_PLAY: SESSION_TIMEOUT_QUEST,
+    CAREER_TEST: SESSION_TIMEOUT_CAREER,
+    CAREER_TEST_PLAY: SESSION_TIMEOUT_CAREER,
+    ADMIN_MENU: SESSION_TIMEOUT_ADMIN,
+    ADMIN_ADD_QUIZ_TITLE: SESSION_TIMEOUT_ADMIN,
+    ADMIN_ADD_QUIZ_QUESTION: SESSION_TIMEOUT_ADMIN,
+    ADMIN_ADD_QUIZ_ANSWERS: SESSION_TIMEOUT_ADMIN,
+    ADMIN_ADD_QUIZ_CORRECT: SESSION_TIMEOUT_ADMIN,
+    ADMIN_ADD_QUIZ_MORE: SESSION_TIMEOUT_ADMIN,
+    ADMIN_ADD_QUEST_TITLE: SESSION_TIMEOUT_ADMIN,
+    ADMIN_ADD_QUEST_STEP_TEXT: SESSION_TIMEOUT_ADMIN,
+    ADMIN_ADD_QUEST_STEP_ANSWER: SESSION_TIMEOUT_ADMIN,
+    ADMIN_ADD_QUEST_MORE: SESSION_TIMEOUT_ADMIN,
+    ADMIN_BROADCAST_TEXT: SESSION_TIMEOUT_ADMIN,
+    ADMIN_BROADCAST_CONFIRM: SESSION_TIMEOUT_ADMIN,
+}
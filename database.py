@@ -1,200 +1,506 @@
+import asyncio
 import aiosqlite
 import os
 import json
-from config import DB_PATH
+import logging
+import pickle
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from config import (
+    DB_PATH, DB_POOL_SIZE,
+    COUNTER_FLUSH_INTERVAL_MS, COUNTER_FLUSH_MAX_EVENTS,
+    KNOWN_USERS_CACHE_SIZE, USER_ACTIVE_REFRESH_SECONDS, RENDER_CACHE_SIZE,
+)
+from achievements import (
+    engine as achievements, RULES,
+    QUIZ_COMPLETED, QUEST_COMPLETED, SECTION_VIEWED, SCORE_CHANGED, CAREER_COMPLETED,
+    DAY_ACTIVE, TOP_SCORER_PLACES,
+)
+from data.content import ACHIEVEMENTS, POLLS
+from migrations import migrate
+from ranking import rank_index
+from render_cache import render_cache
 
+logger = logging.getLogger(__name__)
 
-async def init_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.executescript("""
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT,
-                first_name TEXT,
-                last_name TEXT,
-                score INTEGER DEFAULT 0,
-                quizzes_completed INTEGER DEFAULT 0,
-                quests_completed INTEGER DEFAULT 0,
-                polls_answered INTEGER DEFAULT 0,
-                streak_days INTEGER DEFAULT 0,
-                last_active TEXT,
-                registered_at TEXT DEFAULT (datetime('now'))
-            );
-
-            CREATE TABLE IF NOT EXISTS quizzes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                questions TEXT NOT NULL,
-                created_by INTEGER,
-                created_at TEXT DEFAULT (datetime('now'))
-            );
-
-            CREATE TABLE IF NOT EXISTS quiz_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                quiz_id INTEGER,
-                score INTEGER,
-                total INTEGER,
-                completed_at TEXT DEFAULT (datetime('now')),
-                FOREIGN KEY (user_id) REFERENCES users(user_id),
-                FOREIGN KEY (quiz_id) REFERENCES quizzes(id)
-            );
-
-            CREATE TABLE IF NOT EXISTS quests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                steps TEXT NOT NULL,
-                reward_points INTEGER DEFAULT 10,
-                created_by INTEGER,
-                created_at TEXT DEFAULT (datetime('now'))
-            );
-
-            CREATE TABLE IF NOT EXISTS quest_progress (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                quest_id INTEGER,
-                current_step INTEGER DEFAULT 0,
-                completed INTEGER DEFAULT 0,
-                started_at TEXT DEFAULT (datetime('now')),
-                completed_at TEXT,
-                FOREIGN KEY (user_id) REFERENCES users(user_id),
-                FOREIGN KEY (quest_id) REFERENCES quests(id)
-            );
-
-            CREATE TABLE IF NOT EXISTS poll_responses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                poll_id TEXT,
-                answer TEXT,
-                answered_at TEXT DEFAULT (datetime('now')),
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            );
-
-            CREATE TABLE IF NOT EXISTS achievements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                badge_id TEXT,
-                badge_name TEXT,
-                earned_at TEXT DEFAULT (datetime('now')),
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            );
-        """)
-        await db.commit()
 
+# --- Connections ---
+#
+# SQLite допускает только одного писателя, поэтому все изменения идут через
+# одну корутину-писатель с очередью, а чтения — через пул read-only
+# соединений. В режиме WAL читатели не блокируют писателя и наоборот.
 
-async def get_or_create_user(user_id: int, username: str = None,
-                              first_name: str = None, last_name: str = None):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-        user = await cursor.fetchone()
-        if not user:
-            await db.execute(
-                "INSERT INTO users (user_id, username, first_name, last_name) VALUES (?, ?, ?, ?)",
-                (user_id, username, first_name, last_name)
-            )
-            await db.commit()
-            cursor = await db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-            user = await cursor.fetchone()
-        else:
-            await db.execute(
-                "UPDATE users SET last_active = datetime('now') WHERE user_id = ?",
-                (user_id,)
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+
+class ConnectionPool:
+    """Фиксированный набор долгоживущих read-only соединений aiosqlite.
+
+    Каждое соединение aiosqlite держит собственный поток, поэтому открывать
+    его на каждый запрос дорого. Пул открывает соединения один раз при старте
+    и выдаёт их обработчикам по очереди.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = max(1, size)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._connections = []
+
+    async def open(self):
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(f"file:{self.path}?mode=ro", uri=True)
+            conn.row_factory = aiosqlite.Row
+            await conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections.clear()
+        self._idle = asyncio.Queue()
+
+    @asynccontextmanager
+    async def acquire(self):
+        conn = await self._idle.get()
+        try:
+            yield conn
+        except BaseException:
+            # Не возвращаем в пул соединение с незавершённой транзакцией
+            if conn.in_transaction:
+                await conn.rollback()
+            raise
+        finally:
+            self._idle.put_nowait(conn)
+
+
+class DatabaseWriter:
+    """Единственный писатель: выполняет операции из очереди по одной.
+
+    Операция — корутина ``op(db)``; после неё писатель делает commit
+    (или rollback при ошибке) и возвращает результат ожидающему вызову.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._conn = None
+        self._task = None
+
+    async def start(self):
+        self._conn = await aiosqlite.connect(self.path)
+        self._conn.row_factory = aiosqlite.Row
+        await self._conn.execute("PRAGMA journal_mode = WAL")
+        await self._conn.execute("PRAGMA synchronous = NORMAL")
+        await self._conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        self._task = asyncio.create_task(self._run(), name="sqlite-writer")
+
+    async def stop(self):
+        """Дожидается выполнения уже поставленных операций и закрывает соединение."""
+        if self._task is None:
+            return
+        self._queue.put_nowait((None, None))
+        await self._task
+        self._task = None
+        await self._conn.close()
+        self._conn = None
+
+    async def submit(self, op):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((op, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            op, future = await self._queue.get()
+            if op is None:
+                return
+            try:
+                result = await op(self._conn)
+                await self._conn.commit()
+            except Exception as e:
+                if self._conn.in_transaction:
+                    await self._conn.rollback()
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+
+# --- Write-behind buffers ---
+
+class WriteBehindBuffer:
+    """Основа буферов отложенной записи.
+
+    Сброс идёт в фоне раз в ``interval_ms`` или сразу после ``max_events``
+    изменений, последний — при остановке. Наследник копит изменения в
+    ``_pending`` и реализует ``flush``.
+    """
+
+    name = "write-behind"
+
+    def __init__(self, interval_ms: int, max_events: int):
+        self.interval = interval_ms / 1000
+        self.max_events = max(1, max_events)
+        self._pending = {}
+        self._events = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def _count_event(self):
+        self._events += 1
+        if self._events >= self.max_events:
+            self._wakeup.set()
+
+    async def flush(self):
+        raise NotImplementedError
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run(), name=f"{self.name}-flush")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Не удалось сбросить буфер %s", self.name)
+
+
+class ActivityBuffer(WriteBehindBuffer):
+    """Копит отметки last_active и сбрасывает их одной транзакцией.
+
+    Повторные отметки одного пользователя схлопываются в последнюю.
+    """
+
+    name = "activity"
+
+    # _pending: user_id -> last_active
+
+    def touch(self, user_id: int):
+        self._pending[user_id] = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        self._count_event()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending, self._events = self._pending, {}, 0
+        rows = [(last_active, user_id) for user_id, last_active in batch.items()]
+
+        async def op(db):
+            # Пользователь, от которого пришёл апдейт, снова доступен для рассылок
+            await db.executemany(
+                "UPDATE users SET last_active = ?, blocked_at = NULL WHERE user_id = ?", rows
             )
-            await db.commit()
-        return dict(user)
 
+        try:
+            await _write(op)
+        except Exception:
+            # Возвращаем несохранённые отметки, если новых ещё не появилось
+            for user_id, last_active in batch.items():
+                self._pending.setdefault(user_id, last_active)
+            raise
+
+
+_pool = None
+_writer = None
+_activity = None
+_poll_answers = None
+
+
+async def init_pool(size: int = DB_POOL_SIZE):
+    """Запускает писателя, пул читателей и буферы отложенной записи.
 
-async def update_user_score(user_id: int, points: int):
+    Вызывается один раз из post_init.
+    """
+    global _pool, _writer, _activity, _poll_answers
+    if _pool is not None:
+        return
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    # Писатель создаёт файл БД и включает WAL до открытия read-only соединений
+    writer = DatabaseWriter(DB_PATH)
+    await writer.start()
+    pool = ConnectionPool(DB_PATH, size)
+    await pool.open()
+    _writer, _pool = writer, pool
+    _activity = ActivityBuffer(COUNTER_FLUSH_INTERVAL_MS, COUNTER_FLUSH_MAX_EVENTS)
+    await _activity.start()
+    _poll_answers = PollAnswerBuffer(COUNTER_FLUSH_INTERVAL_MS, COUNTER_FLUSH_MAX_EVENTS)
+    await _poll_answers.start()
+
+
+async def close_pool():
+    global _pool, _writer, _activity, _poll_answers
+    if _pool is None:
+        return
+    # Сначала сбрасываем буферы — им ещё нужен писатель
+    poll_answers, _poll_answers = _poll_answers, None
+    await poll_answers.stop()
+    activity, _activity = _activity, None
+    await activity.stop()
+    pool, _pool = _pool, None
+    writer, _writer = _writer, None
+    await writer.stop()
+    await pool.close()
+
+
+@asynccontextmanager
+async def _reader():
+    """Соединение для чтения из пула, а если пул не открыт (скрипты) — разовое."""
+    if _pool is not None:
+        async with _pool.acquire() as db:
+            yield db
+    else:
+        async with aiosqlite.connect(DB_PATH) as db:
+            db.row_factory = aiosqlite.Row
+            yield db
+
+
+async def _write(op):
+    """Выполняет ``op(db)`` через писателя и возвращает её результат."""
+    if _writer is not None:
+        return await _writer.submit(op)
     async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "UPDATE users SET score = score + ? WHERE user_id = ?",
-            (points, user_id)
-        )
+        db.row_factory = aiosqlite.Row
+        result = await op(db)
         await db.commit()
+        return result
+
+
+async def init_db():
+    """Создаёт файл БД и применяет недостающие миграции схемы."""
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    await _write(migrate)
+
 
+# Пользователи, чья строка в БД точно есть: user_id -> когда последний раз
+# обновляли last_active (time.monotonic). Повторные /start и входы в диалог
+# не ходят в БД, пока не пройдёт USER_ACTIVE_REFRESH_SECONDS.
+_known_users = OrderedDict()
 
-async def increment_stat(user_id: int, field: str):
-    allowed = ["quizzes_completed", "quests_completed", "polls_answered"]
-    if field not in allowed:
+
+async def ensure_user(user_id: int, username: str = None,
+                      first_name: str = None, last_name: str = None) -> None:
+    """Регистрирует пользователя или отмечает его активность.
+
+    Известного процессу пользователя в БД не перечитывает, поэтому ничего
+    не возвращает: профиль — ``get_user``.
+    """
+    now = time.monotonic()
+    refreshed = _known_users.get(user_id)
+    if refreshed is not None:
+        _known_users.move_to_end(user_id)
+        rank_index.add_user(user_id, first_name or username)
+        if now - refreshed >= USER_ACTIVE_REFRESH_SECONDS:
+            _known_users[user_id] = now
+            if _activity is not None:
+                _activity.touch(user_id)
+            else:
+                await _touch_user(user_id)
         return
-    async with aiosqlite.connect(DB_PATH) as db:
+
+    async def upsert(db):
+        cursor = await db.execute(
+            """INSERT INTO users (user_id, username, first_name, last_name, last_active)
+               VALUES (?, ?, ?, ?, datetime('now'))
+               ON CONFLICT (user_id) DO UPDATE SET
+                   username = excluded.username,
+                   first_name = excluded.first_name,
+                   last_name = excluded.last_name,
+                   last_active = excluded.last_active,
+                   blocked_at = NULL
+               RETURNING score""",
+            (user_id, username, first_name, last_name)
+        )
+        return (await cursor.fetchone())[0]
+
+    score = await _write(upsert)
+    rank_index.add_user(user_id, first_name or username, score or 0)
+    _bump_profile_version(user_id)
+
+    _known_users[user_id] = now
+    if len(_known_users) > KNOWN_USERS_CACHE_SIZE:
+        _known_users.popitem(last=False)
+
+
+async def _touch_user(user_id: int):
+    async def op(db):
         await db.execute(
-            f"UPDATE users SET {field} = {field} + 1 WHERE user_id = ?",
+            "UPDATE users SET last_active = datetime('now'), blocked_at = NULL WHERE user_id = ?",
             (user_id,)
         )
-        await db.commit()
+
+    await _write(op)
 
 
 async def get_user_stats(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
-        row = await cursor.fetchone()
-        return dict(row) if row else None
+    return await get_user(user_id)
 
 
 async def get_user(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
         row = await cursor.fetchone()
-        return dict(row) if row else None
+    return dict(row) if row else None
 
 
-async def get_leaderboard(limit: int = 10):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+async def get_profile_snapshot(user_id: int, recent: int = 3):
+    """Всё для экрана профиля одним запросом: пользователь, значки, последние
+    ``recent`` результатов викторин и место в рейтинге.
+
+    Значки и результаты собираются в JSON внутри запроса, LIMIT выполняется
+    в SQLite по индексу ``idx_quiz_results_user``. None — если пользователя нет.
+    """
+    async with _reader() as db:
         cursor = await db.execute(
-            "SELECT * FROM users ORDER BY score DESC LIMIT ?", (limit,)
+            """SELECT u.*,
+                      (SELECT json_group_array(badge_name) FROM (
+                           SELECT badge_name FROM achievements
+                           WHERE user_id = u.user_id ORDER BY earned_at
+                       )) AS badges_json,
+                      (SELECT json_group_array(json_object(
+                           'title', title, 'score', score, 'total', total
+                       )) FROM (
+                           SELECT q.title, r.score, r.total FROM quiz_results r
+                           JOIN quizzes q ON q.id = r.quiz_id
+                           WHERE r.user_id = u.user_id
+                           ORDER BY r.completed_at DESC, r.id DESC LIMIT ?
+                       )) AS recent_json
+               FROM users u WHERE u.user_id = ?""",
+            (recent, user_id)
+        )
+        row = await cursor.fetchone()
+    if not row:
+        return None
+    user = dict(row)
+    badges = json.loads(user.pop("badges_json"))
+    recent_results = json.loads(user.pop("recent_json"))
+    return {
+        "user": user,
+        "badges": badges,
+        "recent_results": recent_results,
+        "rank": rank_index.rank(user_id),
+        "players": len(rank_index),
+    }
+
+
+async def load_rank_index():
+    """Заполняет рейтинг в памяти из таблицы users (вызывается при старте)."""
+    async with _reader() as db:
+        cursor = await db.execute(
+            "SELECT user_id, COALESCE(first_name, username), score FROM users"
         )
         rows = await cursor.fetchall()
-        return [dict(r) for r in rows]
+    rank_index.load(tuple(r) for r in rows)
+
+
+# --- Content version ---
+#
+# Счётчик изменений викторин и квестов: по нему catalog.py понимает,
+# что кэш устарел и его нужно перечитать.
+
+_content_version = 0
+
+
+def content_version() -> int:
+    return _content_version
+
+
+def _bump_content_version():
+    global _content_version
+    _content_version += 1
+
+
+def invalidate_content():
+    """Сбрасывает кэш каталога: контент могли изменить в другом процессе."""
+    _bump_content_version()
+
+
+# --- Profile version ---
+#
+# Счётчик изменений данных профиля по пользователю (баллы, статистика,
+# результаты викторин, значки). По нему render_cache.py понимает, что
+# готовый экран профиля устарел. Общее поколение сбрасывает все профили сразу.
+#
+# Версии берутся из общего счётчика и не повторяются. Записей не больше, чем
+# экранов в render_cache (LRU по последнему изменению); у вытесненного
+# пользователя версия снова 0, поэтому его собранные экраны удаляются вместе
+# с записью — иначе экран, собранный до первого изменения, снова совпал бы.
+
+_profile_generation = 0
+_profile_clock = 0
+_profile_versions = OrderedDict()
+
+
+def profile_version(user_id: int) -> tuple:
+    return _profile_generation, _profile_versions.get(user_id, 0)
+
+
+def _bump_profile_version(user_id: int):
+    global _profile_clock
+    _profile_clock += 1
+    _profile_versions[user_id] = _profile_clock
+    _profile_versions.move_to_end(user_id)
+    if len(_profile_versions) > RENDER_CACHE_SIZE:
+        evicted, _ = _profile_versions.popitem(last=False)
+        render_cache.forget_user(evicted)
+
+
+def invalidate_profiles():
+    global _profile_generation
+    _profile_generation += 1
+    _profile_versions.clear()
 
 
 # --- Quizzes ---
 
 async def get_all_quizzes():
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute("SELECT * FROM quizzes ORDER BY id")
         rows = await cursor.fetchall()
         return [dict(r) for r in rows]
 
 
 async def get_quiz(quiz_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute("SELECT * FROM quizzes WHERE id = ?", (quiz_id,))
         row = await cursor.fetchone()
         return dict(row) if row else None
 
 
 async def add_quiz(title: str, description: str, questions: list, created_by: int = None):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def op(db):
         cursor = await db.execute(
             "INSERT INTO quizzes (title, description, questions, created_by) VALUES (?, ?, ?, ?)",
             (title, description, json.dumps(questions, ensure_ascii=False), created_by)
         )
-        await db.commit()
         return cursor.lastrowid
 
-
-async def save_quiz_result(user_id: int, quiz_id: int, score: int, total: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT INTO quiz_results (user_id, quiz_id, score, total) VALUES (?, ?, ?, ?)",
-            (user_id, quiz_id, score, total)
-        )
-        await db.commit()
+    quiz_id = await _write(op)
+    _bump_content_version()
+    return quiz_id
 
 
 async def get_user_quiz_results(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute(
             """SELECT qr.*, q.title FROM quiz_results qr
                JOIN quizzes q ON qr.quiz_id = q.id
@@ -208,16 +514,14 @@ async def get_user_quiz_results(user_id: int):
 # --- Quests ---
 
 async def get_all_quests():
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute("SELECT * FROM quests ORDER BY id")
         rows = await cursor.fetchall()
         return [dict(r) for r in rows]
 
 
 async def get_quest(quest_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute("SELECT * FROM quests WHERE id = ?", (quest_id,))
         row = await cursor.fetchone()
         return dict(row) if row else None
@@ -225,18 +529,20 @@ async def get_quest(quest_id: int):
 
 async def add_quest(title: str, description: str, steps: list,
                      reward_points: int = 10, created_by: int = None):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def op(db):
         cursor = await db.execute(
             "INSERT INTO quests (title, description, steps, reward_points, created_by) VALUES (?, ?, ?, ?, ?)",
             (title, description, json.dumps(steps, ensure_ascii=False), reward_points, created_by)
         )
-        await db.commit()
         return cursor.lastrowid
 
+    quest_id = await _write(op)
+    _bump_content_version()
+    return quest_id
+
 
 async def get_quest_progress(user_id: int, quest_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute(
             "SELECT * FROM quest_progress WHERE user_id = ? AND quest_id = ? AND completed = 0",
             (user_id, quest_id)
@@ -246,16 +552,17 @@ async def get_quest_progress(user_id: int, quest_id: int):
 
 
 async def start_quest(user_id: int, quest_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def op(db):
         await db.execute(
             "INSERT INTO quest_progress (user_id, quest_id, current_step) VALUES (?, ?, 0)",
             (user_id, quest_id)
         )
-        await db.commit()
+
+    await _write(op)
 
 
 async def advance_quest(user_id: int, quest_id: int, new_step: int, completed: bool = False):
-    async with aiosqlite.connect(DB_PATH) as db:
+    async def op(db):
         if completed:
             await db.execute(
                 """UPDATE quest_progress SET current_step = ?, completed = 1,
@@ -268,30 +575,147 @@ async def advance_quest(user_id: int, quest_id: int, new_step: int, completed: b
                 "UPDATE quest_progress SET current_step = ? WHERE user_id = ? AND quest_id = ? AND completed = 0",
                 (new_step, user_id, quest_id)
             )
-        await db.commit()
+
+    await _write(op)
+
+
+async def save_quest_positions(positions):
+    """Сохраняет текущие этапы нескольких квестов одной транзакцией.
+
+    ``positions`` — пары-тройки (user_id, quest_id, current_step).
+    """
+    rows = [(step, user_id, quest_id) for user_id, quest_id, step in positions]
+    if not rows:
+        return
+
+    async def op(db):
+        await db.executemany(
+            "UPDATE quest_progress SET current_step = ? WHERE user_id = ? AND quest_id = ? AND completed = 0",
+            rows
+        )
+
+    await _write(op)
 
 
 # --- Achievements ---
 
-async def grant_achievement(user_id: int, badge_id: str, badge_name: str):
-    async with aiosqlite.connect(DB_PATH) as db:
+async def _dispatch_write(user_id: int, op):
+    """``_write`` для операций с событием достижений.
+
+    Если транзакция откатилась, счётчики движка в памяти уже могли учесть
+    событие — сбрасываем их, при следующем событии они перечитаются.
+    После успешной записи профиль пользователя считается изменённым.
+    """
+    try:
+        result = await _write(op)
+    except Exception:
+        achievements.forget(user_id)
+        raise
+    _bump_profile_version(user_id)
+    return result
+
+
+async def _score_changed(user_id: int) -> list:
+    """Проверяет значок за место в рейтинге после изменения баллов."""
+    # Дешёвая проверка по рейтингу в памяти, в БД идём только за выдачей
+    score, rank = rank_index.score(user_id), rank_index.rank(user_id)
+    if rank is None or score <= 0 or rank > TOP_SCORER_PLACES:
+        return []
+    progress = achievements.cached(user_id)
+    if progress is not None and "top_scorer" in progress.badges:
+        return []
+
+    async def op(db):
+        return await achievements.dispatch(db, user_id, SCORE_CHANGED, score=score, rank=rank)
+
+    return await _dispatch_write(user_id, op)
+
+
+async def record_section_view(user_id: int, topic_id: str) -> list:
+    """Отмечает изученную тему; возвращает впервые полученные значки."""
+    progress = achievements.cached(user_id)
+    if progress is not None and topic_id in progress.topics:
+        return []
+
+    async def op(db):
+        await db.execute(
+            "INSERT OR IGNORE INTO topic_views (user_id, topic_id) VALUES (?, ?)",
+            (user_id, topic_id)
+        )
+        return await achievements.dispatch(db, user_id, SECTION_VIEWED, topic_id=topic_id)
+
+    return await _dispatch_write(user_id, op)
+
+
+async def record_active_day(user_id: int, today: str, yesterday: str):
+    """Продлевает или начинает серию дней подряд; даты — ISO по TIMEZONE.
+
+    Возвращает ``(серия, новые значки)`` или None, если пользователя ещё нет в БД.
+    """
+    async def op(db):
         cursor = await db.execute(
-            "SELECT id FROM achievements WHERE user_id = ? AND badge_id = ?",
-            (user_id, badge_id)
+            """UPDATE users SET
+                   streak_days = CASE
+                       WHEN last_active_day = :today THEN streak_days
+                       WHEN last_active_day = :yesterday THEN streak_days + 1
+                       ELSE 1 END,
+                   last_active_day = :today
+               WHERE user_id = :user_id
+               RETURNING streak_days""",
+            {"today": today, "yesterday": yesterday, "user_id": user_id}
         )
-        if await cursor.fetchone():
-            return False
-        await db.execute(
-            "INSERT INTO achievements (user_id, badge_id, badge_name) VALUES (?, ?, ?)",
-            (user_id, badge_id, badge_name)
+        row = await cursor.fetchone()
+        if row is None:
+            return None
+        granted = await achievements.dispatch(db, user_id, DAY_ACTIVE, streak=row[0])
+        return row[0], granted
+
+    return await _dispatch_write(user_id, op)
+
+
+async def reset_broken_streaks(yesterday: str) -> int:
+    """Обнуляет серии тех, кто не заходил ни вчера, ни сегодня. Один UPDATE на всех."""
+    async def op(db):
+        cursor = await db.execute(
+            """UPDATE users SET streak_days = 0
+               WHERE streak_days > 0 AND (last_active_day IS NULL OR last_active_day < ?)""",
+            (yesterday,)
         )
-        await db.commit()
-        return True
+        return cursor.rowcount
+
+    reset = await _write(op)
+    if reset:
+        invalidate_profiles()
+    return reset
+
+
+async def backfill_achievements() -> dict:
+    """Выдаёт значки по уже накопленным данным — по запросу на правило.
+
+    Возвращает ``{badge_id: выдано}``.
+    """
+    async def op(db):
+        granted = {}
+        for rule in RULES:
+            if rule.backfill is None:
+                continue
+            cursor = await db.execute(
+                f"""INSERT OR IGNORE INTO achievements (user_id, badge_id, badge_name)
+                    SELECT user_id, ?, ? FROM ({rule.backfill})""",
+                (rule.badge_id, ACHIEVEMENTS[rule.badge_id]["name"])
+            )
+            granted[rule.badge_id] = cursor.rowcount
+        return granted
+
+    granted = await _write(op)
+    # Наборы значков в памяти и готовые профили устарели
+    achievements.clear()
+    invalidate_profiles()
+    return granted
 
 
 async def get_user_achievements(user_id: int):
-    async with aiosqlite.connect(DB_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute(
             "SELECT * FROM achievements WHERE user_id = ? ORDER BY earned_at",
             (user_id,)
@@ -300,11 +724,227 @@ async def get_user_achievements(user_id: int):
         return [dict(r) for r in rows]
 
 
+# --- Completion ---
+#
+# Завершение викторины, квеста или теста профориентации — одна транзакция:
+# баллы, статистика, результат и значки либо сохраняются вместе, либо никак.
+# Функции возвращают названия впервые полученных значков.
+
+QUIZ_POINTS_PER_ANSWER = 5
+CAREER_TEST_POINTS = 5
+
+
+async def complete_quiz(user_id: int, quiz_id: int, score: int, total: int) -> list:
+    async def op(db):
+        await db.execute(
+            """UPDATE users SET score = score + ?,
+               quizzes_completed = quizzes_completed + 1
+               WHERE user_id = ?""",
+            (score * QUIZ_POINTS_PER_ANSWER, user_id)
+        )
+        await db.execute(
+            "INSERT INTO quiz_results (user_id, quiz_id, score, total) VALUES (?, ?, ?, ?)",
+            (user_id, quiz_id, score, total)
+        )
+        return await achievements.dispatch(db, user_id, QUIZ_COMPLETED, score=score, total=total)
+
+    granted = await _dispatch_write(user_id, op)
+    rank_index.add_points(user_id, score * QUIZ_POINTS_PER_ANSWER)
+    return granted + await _score_changed(user_id)
+
+
+async def complete_quest(user_id: int, quest_id: int, steps: int, reward_points: int) -> list:
+    async def op(db):
+        await db.execute(
+            """UPDATE quest_progress SET current_step = ?, completed = 1,
+               completed_at = datetime('now')
+               WHERE user_id = ? AND quest_id = ? AND completed = 0""",
+            (steps, user_id, quest_id)
+        )
+        await db.execute(
+            """UPDATE users SET score = score + ?,
+               quests_completed = quests_completed + 1
+               WHERE user_id = ?""",
+            (reward_points, user_id)
+        )
+        return await achievements.dispatch(db, user_id, QUEST_COMPLETED)
+
+    granted = await _dispatch_write(user_id, op)
+    rank_index.add_points(user_id, reward_points)
+    return granted + await _score_changed(user_id)
+
+
+async def complete_career_test(user_id: int) -> list:
+    async def op(db):
+        await db.execute(
+            "UPDATE users SET score = score + ? WHERE user_id = ?",
+            (CAREER_TEST_POINTS, user_id)
+        )
+        return await achievements.dispatch(db, user_id, CAREER_COMPLETED)
+
+    granted = await _dispatch_write(user_id, op)
+    rank_index.add_points(user_id, CAREER_TEST_POINTS)
+    return granted + await _score_changed(user_id)
+
+
+# --- Polls ---
+#
+# Telegram присылает ответ на опрос отдельным апдейтом poll_answer с id
+# опроса Telegram, поэтому при отправке запоминаем, какой это наш опрос.
+# Ответы копятся в PollAnswerBuffer и пишутся пачкой; баллы начисляются
+# только за первый ответ пользователя на опрос — в той же транзакции.
+
+POLL_ANSWER_POINTS = 2
+
+_POLL_OPTIONS = {poll["id"]: poll["options"] for poll in POLLS}
+
+
+async def register_sent_poll(telegram_poll_id: str, poll_id: str, user_id: int):
+    async def op(db):
+        await db.execute(
+            """INSERT OR IGNORE INTO sent_polls (telegram_poll_id, poll_id, user_id)
+               VALUES (?, ?, ?)""",
+            (telegram_poll_id, poll_id, user_id)
+        )
+
+    await _write(op)
+
+
+async def _save_poll_answers(batch: dict) -> list:
+    """Записывает ответы ``{(user_id, telegram_poll_id): option_ids}``.
+
+    Возвращает пользователей, которым начислены баллы.
+    """
+    telegram_ids = list({telegram_poll_id for _, telegram_poll_id in batch})
+
+    async def op(db):
+        cursor = await db.execute(
+            f"""SELECT telegram_poll_id, poll_id FROM sent_polls
+                WHERE telegram_poll_id IN ({",".join("?" * len(telegram_ids))})""",
+            telegram_ids
+        )
+        polls = {row[0]: row[1] for row in await cursor.fetchall()}
+
+        awarded = []
+        counts = {}
+        for (user_id, telegram_poll_id), option_ids in batch.items():
+            poll_id = polls.get(telegram_poll_id)
+            if poll_id is None:
+                # Опрос отправлен не этим ботом или до появления sent_polls
+                continue
+            options = _POLL_OPTIONS.get(poll_id, ())
+            answer = ", ".join(options[i] for i in option_ids if i < len(options))
+            cursor = await db.execute(
+                "INSERT OR IGNORE INTO poll_responses (user_id, poll_id, answer) VALUES (?, ?, ?)",
+                (user_id, poll_id, answer)
+            )
+            if cursor.rowcount:
+                awarded.append(user_id)
+                counts[(poll_id, answer)] = counts.get((poll_id, answer), 0) + 1
+
+        await db.executemany(
+            """UPDATE users SET score = score + ?,
+               polls_answered = polls_answered + 1
+               WHERE user_id = ?""",
+            [(POLL_ANSWER_POINTS, user_id) for user_id in awarded]
+        )
+        await db.executemany(
+            """INSERT INTO poll_option_counts (poll_id, answer, count) VALUES (?, ?, ?)
+               ON CONFLICT (poll_id, answer) DO UPDATE SET count = count + excluded.count""",
+            [(poll_id, answer, n) for (poll_id, answer), n in counts.items()]
+        )
+        return awarded
+
+    awarded = await _write(op)
+    for user_id in awarded:
+        rank_index.add_points(user_id, POLL_ANSWER_POINTS)
+        _bump_profile_version(user_id)
+        await _score_changed(user_id)
+    return awarded
+
+
+class PollAnswerBuffer(WriteBehindBuffer):
+    """Копит ответы на опросы: всплеск ответов целого класса — одна транзакция."""
+
+    name = "poll-answers"
+
+    # _pending: (user_id, telegram_poll_id) -> option_ids
+
+    def add(self, user_id: int, telegram_poll_id: str, option_ids):
+        self._pending[(user_id, telegram_poll_id)] = tuple(option_ids)
+        self._count_event()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending, self._events = self._pending, {}, 0
+        try:
+            await _save_poll_answers(batch)
+        except Exception:
+            # Более свежий ответ того же пользователя важнее несохранённого
+            for key, option_ids in batch.items():
+                self._pending.setdefault(key, option_ids)
+            raise
+
+
+async def record_poll_answer(user_id: int, telegram_poll_id: str, option_ids):
+    """Ответ из апдейта poll_answer. Отзыв голоса (пустой ответ) не учитывается."""
+    if not option_ids:
+        return
+    if _poll_answers is not None:
+        _poll_answers.add(user_id, telegram_poll_id, option_ids)
+        return
+    await _save_poll_answers({(user_id, telegram_poll_id): tuple(option_ids)})
+
+
+async def get_poll_results(poll_id: str) -> dict:
+    """Распределение ответов ``{вариант: число}`` из счётчиков, без обхода ответов."""
+    async with _reader() as db:
+        cursor = await db.execute(
+            "SELECT answer, count FROM poll_option_counts WHERE poll_id = ?", (poll_id,)
+        )
+        return {row[0]: row[1] for row in await cursor.fetchall()}
+
+
+_POLL_COUNTS_FROM_RESPONSES = """
+    SELECT poll_id, answer, COUNT(*) FROM poll_responses
+    WHERE poll_id IS NOT NULL AND answer IS NOT NULL
+    GROUP BY poll_id, answer
+"""
+
+
+async def check_poll_counts() -> int:
+    """Сверяет счётчики с ответами и при расхождении пересобирает их.
+
+    Возвращает число расходившихся строк (0 — счётчики верны).
+    """
+    async def op(db):
+        cursor = await db.execute(
+            f"""SELECT COUNT(*) FROM (
+                    SELECT * FROM ({_POLL_COUNTS_FROM_RESPONSES}
+                        EXCEPT SELECT poll_id, answer, count FROM poll_option_counts)
+                    UNION ALL
+                    SELECT * FROM (SELECT poll_id, answer, count FROM poll_option_counts
+                        EXCEPT {_POLL_COUNTS_FROM_RESPONSES})
+                )"""
+        )
+        mismatched = (await cursor.fetchone())[0]
+        if mismatched:
+            await db.execute("DELETE FROM poll_option_counts")
+            await db.execute(
+                f"INSERT INTO poll_option_counts (poll_id, answer, count) {_POLL_COUNTS_FROM_RESPONSES}"
+            )
+        return mismatched
+
+    return await _write(op)
+
+
 # --- Seed data ---
 
 async def seed_default_data():
     from data.content import DEFAULT_QUIZZES, DEFAULT_QUESTS
-    async with aiosqlite.connect(DB_PATH) as db:
+
+    async def op(db):
         cursor = await db.execute("SELECT COUNT(*) FROM quizzes")
         count = (await cursor.fetchone())[0]
         if count == 0:
@@ -320,4 +960,268 @@ async def seed_default_data():
                     (quest["title"], quest["description"],
                      json.dumps(quest["steps"], ensure_ascii=False), quest["reward_points"])
                 )
-            await db.commit()
+
+    await _write(op)
+    _bump_content_version()
+
+
+# --- Bot state persistence ---
+#
+# Значения user_data/chat_data хранятся как pickle, ключи диалогов — как JSON.
+# Записи старше ``max_age`` секунд считаются брошенными и не загружаются.
+
+async def load_bot_state(user_id: int, chat_id: int = None, max_age: int = None) -> dict:
+    """Сохранённое состояние одного пользователя (и его чата) для ленивой загрузки."""
+    since = int(time.time()) - max_age if max_age else 0
+    async with _reader() as db:
+        cursor = await db.execute(
+            "SELECT data FROM persistence_user_data WHERE user_id = ? AND updated_at >= ?",
+            (user_id, since)
+        )
+        user_row = await cursor.fetchone()
+        chat_row = None
+        if chat_id is not None:
+            cursor = await db.execute(
+                "SELECT data FROM persistence_chat_data WHERE chat_id = ? AND updated_at >= ?",
+                (chat_id, since)
+            )
+            chat_row = await cursor.fetchone()
+        cursor = await db.execute(
+            "SELECT name, key, state FROM persistence_conversations WHERE user_id = ? AND updated_at >= ?",
+            (user_id, since)
+        )
+        conversation_rows = await cursor.fetchall()
+
+    conversations = {}
+    for row in conversation_rows:
+        conversations.setdefault(row["name"], {})[tuple(json.loads(row["key"]))] = row["state"]
+    return {
+        "user_data": pickle.loads(user_row["data"]) if user_row else None,
+        "chat_data": pickle.loads(chat_row["data"]) if chat_row else None,
+        "conversations": conversations,
+    }
+
+
+async def save_bot_state(user_data: dict, chat_data: dict, conversations: dict, max_age: int = None):
+    """Записывает накопленные изменения состояния одной транзакцией.
+
+    ``user_data`` и ``chat_data`` — {id: данные или None для удаления},
+    ``conversations`` — {(name, key): состояние или None для удаления}.
+    """
+    now = int(time.time())
+    user_rows = [(uid, pickle.dumps(data), now) for uid, data in user_data.items() if data is not None]
+    user_drops = [(uid,) for uid, data in user_data.items() if data is None]
+    chat_rows = [(cid, pickle.dumps(data), now) for cid, data in chat_data.items() if data is not None]
+    chat_drops = [(cid,) for cid, data in chat_data.items() if data is None]
+    conv_rows = [
+        (name, json.dumps(list(key)), key[-1], state, now)
+        for (name, key), state in conversations.items() if state is not None
+    ]
+    conv_drops = [
+        (name, json.dumps(list(key)))
+        for (name, key), state in conversations.items() if state is None
+    ]
+
+    async def op(db):
+        await db.executemany(
+            "INSERT OR REPLACE INTO persistence_user_data (user_id, data, updated_at) VALUES (?, ?, ?)",
+            user_rows
+        )
+        await db.executemany("DELETE FROM persistence_user_data WHERE user_id = ?", user_drops)
+        await db.executemany(
+            "INSERT OR REPLACE INTO persistence_chat_data (chat_id, data, updated_at) VALUES (?, ?, ?)",
+            chat_rows
+        )
+        await db.executemany("DELETE FROM persistence_chat_data WHERE chat_id = ?", chat_drops)
+        await db.executemany(
+            "INSERT OR REPLACE INTO persistence_conversations (name, key, user_id, state, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            conv_rows
+        )
+        await db.executemany(
+            "DELETE FROM persistence_conversations WHERE name = ? AND key = ?", conv_drops
+        )
+        if max_age:
+            # Брошенное состояние пользователей, не вернувшихся после рестарта
+            for table in ("persistence_user_data", "persistence_chat_data", "persistence_conversations"):
+                await db.execute(f"DELETE FROM {table} WHERE updated_at < ?", (now - max_age,))
+
+    await _write(op)
+
+
+# --- Broadcasts ---
+#
+# Рассылка идёт по получателям своей аудитории в порядке user_id порциями
+# (keyset-пагинация), после каждой порции позиция и счётчики сохраняются.
+# Выполняет её тот процесс, что держит аренду (lease): после рестарта или
+# падения аренда истекает, и рассылку подхватывает следующий.
+
+# Аудитория рассылки -> выборка получателей (без заблокировавших бота)
+_AUDIENCES = {
+    "all": "users WHERE blocked_at IS NULL",
+    "fact_subscribers": (
+        "users JOIN fact_subscriptions USING (user_id) WHERE users.blocked_at IS NULL"
+    ),
+}
+
+
+async def _count_audience(db, audience: str) -> int:
+    cursor = await db.execute(f"SELECT COUNT(*) FROM {_AUDIENCES[audience]}")
+    return (await cursor.fetchone())[0]
+
+
+async def create_broadcast(text: str, created_by: int, owner: str, lease_seconds: int,
+                           status_chat_id: int = None, status_message_id: int = None,
+                           audience: str = "all", pace: float = 0, job_run: tuple = None):
+    """Создаёт рассылку сразу с арендой у вызывающего процесса.
+
+    ``pace`` — минимальное время на одну порцию (с), чтобы растянуть
+    рассылку на заданное окно. ``job_run`` — пара (задача, дата) для
+    ежедневных рассылок: запуск отмечается в ``job_runs`` в той же
+    транзакции, и если за эту дату он уже был, рассылка не создаётся
+    (возвращается None).
+    """
+    async def op(db):
+        if job_run is not None:
+            cursor = await db.execute(
+                "INSERT OR IGNORE INTO job_runs (name, run_date) VALUES (?, ?)", job_run
+            )
+            if not cursor.rowcount:
+                return None
+        total = await _count_audience(db, audience)
+        cursor = await db.execute(
+            """INSERT INTO broadcasts (text, created_by, total, status_chat_id, status_message_id,
+                                       lease_owner, lease_until, audience, pace)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) RETURNING *""",
+            (text, created_by, total, status_chat_id, status_message_id,
+             owner, int(time.time()) + lease_seconds, audience, pace)
+        )
+        return dict(await cursor.fetchone())
+
+    return await _write(op)
+
+
+async def claim_broadcast(owner: str, lease_seconds: int):
+    """Берёт в работу незавершённую рассылку с истёкшей арендой или возвращает None."""
+    now = int(time.time())
+
+    async def op(db):
+        cursor = await db.execute(
+            """UPDATE broadcasts SET lease_owner = ?, lease_until = ?
+               WHERE id = (SELECT id FROM broadcasts
+                           WHERE status = 'running' AND lease_until < ?
+                           ORDER BY id LIMIT 1)
+               RETURNING *""",
+            (owner, now + lease_seconds, now)
+        )
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+    return await _write(op)
+
+
+async def get_broadcast_recipients(audience: str, after_user_id: int, limit: int) -> list:
+    async with _reader() as db:
+        cursor = await db.execute(
+            f"""SELECT user_id FROM {_AUDIENCES[audience]} AND user_id > ?
+                ORDER BY user_id LIMIT ?""",
+            (after_user_id, limit)
+        )
+        return [row[0] for row in await cursor.fetchall()]
+
+
+async def save_broadcast_progress(broadcast_id: int, owner: str, last_user_id: int,
+                                  sent: int, failed: int, blocked_ids, elapsed: float,
+                                  lease_seconds: int, finished: bool = False) -> bool:
+    """Контрольная точка: позиция, приращения счётчиков и заблокировавшие бота.
+
+    Возвращает False, если рассылку отменили или аренду перехватили —
+    тогда продолжать её этому процессу нельзя.
+    """
+    blocked_rows = [(user_id,) for user_id in blocked_ids]
+
+    async def op(db):
+        cursor = await db.execute(
+            """UPDATE broadcasts SET last_user_id = ?, sent = sent + ?, failed = failed + ?,
+                   blocked = blocked + ?, elapsed = elapsed + ?, lease_until = ?,
+                   status = CASE WHEN ? THEN 'done' ELSE status END,
+                   finished_at = CASE WHEN ? THEN datetime('now') ELSE finished_at END
+               WHERE id = ? AND lease_owner = ? AND status = 'running'""",
+            (last_user_id, sent, failed, len(blocked_rows), elapsed,
+             int(time.time()) + lease_seconds, finished, finished, broadcast_id, owner)
+        )
+        if cursor.rowcount == 0:
+            return False
+        await db.executemany(
+            "UPDATE users SET blocked_at = datetime('now') WHERE user_id = ?", blocked_rows
+        )
+        return True
+
+    saved = await _write(op)
+    # Вернувшийся пользователь должен сразу снять отметку о блокировке
+    for user_id in blocked_ids:
+        _known_users.pop(user_id, None)
+    return saved
+
+
+async def release_broadcast(broadcast_id: int, owner: str):
+    """Отдаёт аренду при остановке бота, чтобы рестарт продолжил рассылку сразу."""
+    async def op(db):
+        await db.execute(
+            "UPDATE broadcasts SET lease_until = 0 WHERE id = ? AND lease_owner = ?",
+            (broadcast_id, owner)
+        )
+
+    await _write(op)
+
+
+async def cancel_broadcast(broadcast_id: int) -> bool:
+    async def op(db):
+        cursor = await db.execute(
+            """UPDATE broadcasts SET status = 'cancelled', finished_at = datetime('now')
+               WHERE id = ? AND status = 'running'""",
+            (broadcast_id,)
+        )
+        return cursor.rowcount > 0
+
+    return await _write(op)
+
+
+async def get_broadcast(broadcast_id: int):
+    async with _reader() as db:
+        cursor = await db.execute("SELECT * FROM broadcasts WHERE id = ?", (broadcast_id,))
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+
+async def get_active_broadcasts() -> list:
+    async with _reader() as db:
+        cursor = await db.execute("SELECT * FROM broadcasts WHERE status = 'running' ORDER BY id")
+        return [dict(r) for r in await cursor.fetchall()]
+
+
+async def count_reachable_users(audience: str = "all") -> int:
+    async with _reader() as db:
+        return await _count_audience(db, audience)
+
+
+# --- Fact of the day ---
+
+async def is_fact_subscriber(user_id: int) -> bool:
+    async with _reader() as db:
+        cursor = await db.execute(
+            "SELECT 1 FROM fact_subscriptions WHERE user_id = ?", (user_id,)
+        )
+        return await cursor.fetchone() is not None
+
+
+async def set_fact_subscription(user_id: int, subscribed: bool):
+    async def op(db):
+        if subscribed:
+            await db.execute(
+                "INSERT OR IGNORE INTO fact_subscriptions (user_id) VALUES (?)", (user_id,)
+            )
+        else:
+            await db.execute("DELETE FROM fact_subscriptions WHERE user_id = ?", (user_id,))
+
+    await _write(op)
@@ -0,0 +1,57 @@
+"""Факт дня и его ежедневная рассылка подписчикам.
+
+Факт дня детерминирован: один и тот же для всех в течение суток по
+``TIMEZONE``. В ``FACT_PUSH_TIME`` он рассылается подписчикам через
+общий механизм рассылок (``broadcast.py``) — фоновой полосой лимитера и
+порциями, равномерно распределёнными на ``FACT_PUSH_WINDOW_MINUTES``.
+
+Запуск за дату отмечается в таблице ``job_runs`` в одной транзакции с
+созданием рассылки: рестарт бота или несколько воркеров не отправят факт
+дважды, сбой до создания рассылки не оставит дату отмеченной, а бот,
+запущенный позже времени рассылки, догонит её при старте — если опоздал
+не больше чем на ``FACT_PUSH_CATCHUP_MINUTES``: деплой поздним вечером не
+должен будить подписчиков утренним фактом.
+"""
+
+import logging
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from telegram.ext import ContextTypes
+
+from broadcast import broadcaster
+from config import FACT_PUSH_TIME, FACT_PUSH_WINDOW_MINUTES, FACT_PUSH_CATCHUP_MINUTES, TIMEZONE
+from data.content import DAILY_FACTS
+
+logger = logging.getLogger(__name__)
+
+tz = ZoneInfo(TIMEZONE)
+_hours, _minutes = map(int, FACT_PUSH_TIME.split(":"))
+push_time = time(_hours, _minutes, tzinfo=tz)
+
+
+def today() -> date:
+    return datetime.now(tz).date()
+
+
+def fact_for_date(day: date) -> str:
+    return DAILY_FACTS[day.toordinal() % len(DAILY_FACTS)]
+
+
+async def push_daily_fact(context: ContextTypes.DEFAULT_TYPE):
+    """Задача JobQueue: рассылает факт дня подписчикам, не больше раза за дату."""
+    now = datetime.now(tz)
+    day = now.date()
+    scheduled = datetime.combine(day, push_time)
+    if not scheduled <= now < scheduled + timedelta(minutes=FACT_PUSH_CATCHUP_MINUTES):
+        return
+    b = await broadcaster.start(
+        context.bot,
+        f"\U0001f4a1 Факт дня\n\n{fact_for_date(day)}",
+        audience="fact_subscribers",
+        window=FACT_PUSH_WINDOW_MINUTES * 60,
+        job_run=("fact_push", day.isoformat()),
+    )
+    if b is None:
+        return
+    logger.info("Факт дня за %s: рассылка #%d, получателей %d", day, b["id"], b["total"])
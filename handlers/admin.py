@@ -1,6 +1,7 @@
 """Админ-панель — создание викторин и квестов через бота."""
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
 from config import (
@@ -9,8 +10,17 @@ from config import (
     ADMIN_ADD_QUIZ_ANSWERS, ADMIN_ADD_QUIZ_CORRECT, ADMIN_ADD_QUIZ_MORE,
     ADMIN_ADD_QUEST_TITLE, ADMIN_ADD_QUEST_STEP_TEXT,
     ADMIN_ADD_QUEST_STEP_ANSWER, ADMIN_ADD_QUEST_MORE,
+    ADMIN_BROADCAST_TEXT, ADMIN_BROADCAST_CONFIRM,
 )
-from database import add_quiz, add_quest, get_all_quizzes, get_all_quests
+from catalog import catalog
+from database import (
+    add_quiz, add_quest, get_active_broadcasts, count_reachable_users,
+    cancel_broadcast, get_broadcast, get_poll_results, backfill_achievements,
+)
+from data.content import POLLS, ACHIEVEMENTS
+from broadcast import broadcaster, format_progress, progress_keyboard
+from sessions import QuizDraft, QuestDraft, session_stats
+from ratelimit import rate_limit_stats, INTERACTIVE, BACKGROUND
 
 
 def is_admin(user_id: int) -> bool:
@@ -30,18 +40,30 @@ async def admin_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query:
         await query.answer()
 
-    quizzes = await get_all_quizzes()
-    quests = await get_all_quests()
+    quizzes = await catalog.quizzes()
+    quests = await catalog.quests()
+    interactive = rate_limit_stats.lanes[INTERACTIVE]
+    background = rate_limit_stats.lanes[BACKGROUND]
+    broadcasts = await get_active_broadcasts()
 
     text = (
         "\U0001f6e0 <b>Админ-панель</b>\n\n"
         f"Викторин: <b>{len(quizzes)}</b>\n"
         f"Квестов: <b>{len(quests)}</b>\n\n"
-        "Выберите действие:"
+        f"Активных сессий: <b>{session_stats.live_sessions}</b> "
+        f"(вытеснено: {session_stats.evicted_sessions})\n"
+        f"Ожидание отправки: <b>{interactive.avg_wait * 1000:.0f} мс</b> "
+        f"(макс. {interactive.max_wait * 1000:.0f} мс, фон: {background.avg_wait * 1000:.0f} мс), "
+        f"повторов после RetryAfter: {rate_limit_stats.retries}\n"
     )
+    for b in broadcasts:
+        text += f"Рассылка #{b['id']}: отправлено {b['sent']} из {b['total']}\n"
+    text += "\nВыберите действие:"
     keyboard = [
         [InlineKeyboardButton("\u2795 Добавить викторину", callback_data="admin_add_quiz")],
         [InlineKeyboardButton("\u2795 Добавить квест", callback_data="admin_add_quest")],
+        [InlineKeyboardButton("\U0001f4e3 Рассылка", callback_data="admin_broadcast")],
+        [InlineKeyboardButton("\U0001f4ca Результаты опросов", callback_data="admin_polls")],
         [InlineKeyboardButton("\U0001f3e0 Главное меню", callback_data="back_to_menu")],
     ]
 
@@ -62,10 +84,7 @@ async def admin_add_quiz_start(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
 
-    context.user_data["admin_quiz"] = {
-        "questions": [],
-        "current_question": {},
-    }
+    context.user_data["admin_quiz"] = QuizDraft()
     await query.edit_message_text(
         "\U0001f4dd <b>Создание викторины</b>\n\n"
         "Введите <b>название</b> викторины:",
@@ -76,7 +95,7 @@ async def admin_add_quiz_start(update: Update, context: ContextTypes.DEFAULT_TYP
 
 async def admin_quiz_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
     title = update.message.text.strip()
-    context.user_data["admin_quiz"]["title"] = title
+    context.user_data["admin_quiz"].title = title
 
     await update.message.reply_text(
         f"Название: <b>{title}</b>\n\n"
@@ -88,10 +107,7 @@ async def admin_quiz_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def admin_quiz_question(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
-    context.user_data["admin_quiz"]["current_question"] = {
-        "text": text,
-        "options": [],
-    }
+    context.user_data["admin_quiz"].question_text = text
 
     await update.message.reply_text(
         f"Вопрос: <i>{text}</i>\n\n"
@@ -108,7 +124,7 @@ async def admin_quiz_answers(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text("Нужно минимум 2 варианта. Попробуйте ещё раз:")
         return ADMIN_ADD_QUIZ_ANSWERS
 
-    context.user_data["admin_quiz"]["current_question"]["options"] = lines[:4]
+    context.user_data["admin_quiz"].options = tuple(lines[:4])
 
     options_text = "\n".join(f"  {i + 1}) {opt}" for i, opt in enumerate(lines[:4]))
     await update.message.reply_text(
@@ -122,21 +138,16 @@ async def admin_quiz_answers(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def admin_quiz_correct(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         correct_idx = int(update.message.text.strip()) - 1
-        options = context.user_data["admin_quiz"]["current_question"]["options"]
+        options = context.user_data["admin_quiz"].options
         if correct_idx < 0 or correct_idx >= len(options):
             raise ValueError
     except ValueError:
         await update.message.reply_text("Неверный номер. Попробуйте ещё раз:")
         return ADMIN_ADD_QUIZ_CORRECT
 
-    cq = context.user_data["admin_quiz"]["current_question"]
-    cq["correct"] = correct_idx
-    cq["explanation"] = ""
-
-    context.user_data["admin_quiz"]["questions"].append(cq)
-    context.user_data["admin_quiz"]["current_question"] = {}
-
-    count = len(context.user_data["admin_quiz"]["questions"])
+    draft = context.user_data["admin_quiz"]
+    draft.add_question(correct_idx)
+    count = len(draft.questions)
 
     keyboard = [
         [InlineKeyboardButton("\u2795 Добавить ещё вопрос", callback_data="admin_quiz_more")],
@@ -166,9 +177,9 @@ async def admin_quiz_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    data = context.user_data.get("admin_quiz", {})
-    title = data.get("title", "Без названия")
-    questions = data.get("questions", [])
+    draft = context.user_data.get("admin_quiz") or QuizDraft()
+    title = draft.title or "Без названия"
+    questions = draft.questions
 
     if not questions:
         await query.edit_message_text("Нет вопросов для сохранения.")
@@ -204,10 +215,7 @@ async def admin_add_quest_start(update: Update, context: ContextTypes.DEFAULT_TY
     query = update.callback_query
     await query.answer()
 
-    context.user_data["admin_quest"] = {
-        "steps": [],
-        "current_step": {},
-    }
+    context.user_data["admin_quest"] = QuestDraft()
     await query.edit_message_text(
         "\U0001f4dd <b>Создание квеста</b>\n\n"
         "Введите <b>название</b> квеста:",
@@ -218,7 +226,7 @@ async def admin_add_quest_start(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def admin_quest_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
     title = update.message.text.strip()
-    context.user_data["admin_quest"]["title"] = title
+    context.user_data["admin_quest"].title = title
 
     await update.message.reply_text(
         f"Название: <b>{title}</b>\n\n"
@@ -231,9 +239,7 @@ async def admin_quest_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def admin_quest_step_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text.strip()
-    context.user_data["admin_quest"]["current_step"] = {
-        "text": text,
-    }
+    context.user_data["admin_quest"].step_text = text
 
     await update.message.reply_text(
         "Теперь введите <b>правильный ответ</b> на этот этап "
@@ -245,14 +251,9 @@ async def admin_quest_step_text(update: Update, context: ContextTypes.DEFAULT_TY
 
 async def admin_quest_step_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     answer = update.message.text.strip()
-    step = context.user_data["admin_quest"]["current_step"]
-    step["answer"] = answer
-    step["hint"] = ""
-
-    context.user_data["admin_quest"]["steps"].append(step)
-    context.user_data["admin_quest"]["current_step"] = {}
-
-    count = len(context.user_data["admin_quest"]["steps"])
+    draft = context.user_data["admin_quest"]
+    draft.add_step(answer)
+    count = len(draft.steps)
 
     keyboard = [
         [InlineKeyboardButton("\u2795 Добавить ещё этап", callback_data="admin_quest_more")],
@@ -282,9 +283,9 @@ async def admin_quest_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    data = context.user_data.get("admin_quest", {})
-    title = data.get("title", "Без названия")
-    steps = data.get("steps", [])
+    draft = context.user_data.get("admin_quest") or QuestDraft()
+    title = draft.title or "Без названия"
+    steps = draft.steps
 
     if not steps:
         await query.edit_message_text("Нет этапов для сохранения.")
@@ -314,3 +315,169 @@ async def admin_quest_save(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="HTML",
     )
     return ADMIN_MENU
+
+
+# ── Рассылка ──
+
+async def admin_broadcast_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_admin(update.effective_user.id):
+        return await admin_menu(update, context)
+
+    text = (
+        "\U0001f4e3 <b>Рассылка</b>\n\n"
+        "Введите <b>текст сообщения</b> для всех пользователей:"
+    )
+    query = update.callback_query
+    if query:
+        await query.answer()
+        await query.edit_message_text(text, parse_mode="HTML")
+    else:
+        await update.message.reply_text(text, parse_mode="HTML")
+    return ADMIN_BROADCAST_TEXT
+
+
+async def admin_broadcast_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    text = update.message.text.strip()
+    context.user_data["admin_broadcast"] = text
+    recipients = await count_reachable_users()
+
+    keyboard = [
+        [InlineKeyboardButton("\u2705 Отправить", callback_data="admin_broadcast_send")],
+        [InlineKeyboardButton("\u274c Отмена", callback_data="admin_menu")],
+    ]
+    await update.message.reply_text(
+        f"Получателей: <b>{recipients}</b>\n\n"
+        "Сообщение будет выглядеть так:",
+        parse_mode="HTML",
+    )
+    await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+    return ADMIN_BROADCAST_CONFIRM
+
+
+async def admin_broadcast_send(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    text = context.user_data.pop("admin_broadcast", None)
+    if not text or not is_admin(query.from_user.id):
+        return await admin_menu(update, context)
+
+    # Отдельное сообщение, в котором бот будет обновлять прогресс
+    status = await query.message.reply_text("\U0001f4e3 Рассылка запускается...")
+    b = await broadcaster.start(context.bot, text, query.from_user.id, status)
+    await status.edit_text(
+        format_progress(b), reply_markup=progress_keyboard(b), parse_mode="HTML"
+    )
+
+    keyboard = [[InlineKeyboardButton("\U0001f6e0 Админ-панель", callback_data="admin_menu")]]
+    await query.message.reply_text(
+        f"Рассылка #{b['id']} запущена. Прогресс обновляется в сообщении выше.",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+    )
+    return ADMIN_MENU
+
+
+async def broadcast_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Кнопка «Остановить» под сообщением о прогрессе (в любом состоянии диалога и без него)."""
+    query = update.callback_query
+    if not is_admin(query.from_user.id):
+        await query.answer("Нет доступа.", show_alert=True)
+        return
+
+    broadcast_id = context.args[0]
+    cancelled = await cancel_broadcast(broadcast_id)
+    await query.answer("Рассылка остановлена." if cancelled else "Рассылка уже завершена.")
+
+    b = await get_broadcast(broadcast_id)
+    if b:
+        await query.edit_message_text(
+            format_progress(b), reply_markup=progress_keyboard(b), parse_mode="HTML"
+        )
+
+
+# ── Результаты опросов ──
+
+async def admin_poll_results(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if not is_admin(update.effective_user.id):
+        await query.answer("Нет доступа.", show_alert=True)
+        return MAIN_MENU
+    await query.answer()
+
+    keyboard = [
+        [InlineKeyboardButton(
+            poll["question"][:50] + ("..." if len(poll["question"]) > 50 else ""),
+            callback_data=f"admin_poll:{i}",
+        )]
+        for i, poll in enumerate(POLLS)
+    ]
+    keyboard.append([InlineKeyboardButton("\u2b05\ufe0f Назад", callback_data="admin_menu")])
+    await query.edit_message_text(
+        "\U0001f4ca <b>Результаты опросов</b>\n\nВыберите опрос:",
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode="HTML",
+    )
+    return ADMIN_MENU
+
+
+def _bar(share: float, width: int = 10) -> str:
+    filled = round(share * width)
+    return "\u2588" * filled + "\u2591" * (width - filled)
+
+
+async def admin_poll_result(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    if not is_admin(update.effective_user.id):
+        await query.answer("Нет доступа.", show_alert=True)
+        return MAIN_MENU
+    await query.answer()
+
+    poll_idx = context.args[0]
+    if poll_idx >= len(POLLS):
+        return ADMIN_MENU
+    poll = POLLS[poll_idx]
+
+    counts = await get_poll_results(poll["id"])
+    total = sum(counts.values())
+    # Варианты из контента идут первыми и в своём порядке, даже без голосов
+    answers = list(poll["options"]) + [a for a in counts if a not in poll["options"]]
+
+    text = f"\U0001f4ca <b>{poll['question']}</b>\n\n"
+    for answer in answers:
+        count = counts.get(answer, 0)
+        share = count / total if total else 0
+        text += f"{answer}\n{_bar(share)} {count} ({share:.0%})\n\n"
+    text += f"Всего ответов: <b>{total}</b>"
+
+    keyboard = [
+        [InlineKeyboardButton("\U0001f504 Обновить", callback_data=f"admin_poll:{poll_idx}")],
+        [InlineKeyboardButton("\u2b05\ufe0f К опросам", callback_data="admin_polls")],
+    ]
+    try:
+        await query.edit_message_text(
+            text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML"
+        )
+    except BadRequest as exc:
+        # «Обновить» без новых ответов — текст не изменился
+        if "not modified" not in str(exc).lower():
+            raise
+    return ADMIN_MENU
+
+
+# ── Достижения ──
+
+async def admin_backfill_achievements(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/backfill_achievements — выдаёт значки, заработанные до появления правил."""
+    if not is_admin(update.effective_user.id):
+        return await admin_menu(update, context)
+
+    granted = await backfill_achievements()
+    lines = [
+        f"{ACHIEVEMENTS[badge_id]['name']}: <b>{count}</b>"
+        for badge_id, count in granted.items()
+    ]
+    await update.message.reply_text(
+        "\U0001f3c6 <b>Достижения пересчитаны</b>\n\nВыдано:\n" + "\n".join(lines),
+        parse_mode="HTML",
+    )
+    return ADMIN_MENU
@@ -5,6 +5,7 @@ from telegram.ext import ContextTypes
 
 from config import MAIN_MENU, EDUCATION_TOPIC, EDUCATION_DETAIL
 from data.content import EDUCATION_TOPICS
+from database import record_section_view
 
 
 async def education_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -33,7 +34,7 @@ async def topic_sections(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    topic_key = query.data.split(":")[1]
+    topic_key = context.args[0]
     topic = EDUCATION_TOPICS.get(topic_key)
     if not topic:
         await query.edit_message_text("Тема не найдена.")
@@ -63,9 +64,7 @@ async def section_detail(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    parts = query.data.split(":")
-    topic_key = parts[1]
-    section_key = parts[2]
+    topic_key, section_key = context.args
 
     topic = EDUCATION_TOPICS.get(topic_key)
     if not topic:
@@ -111,9 +110,12 @@ async def section_detail(update: Update, context: ContextTypes.DEFAULT_TYPE):
     progress = f"({current_idx + 1}/{len(section_keys)})"
 
     full_text = f"{section['text']}\n\n<i>{progress}</i>"
+    new_achievements = await record_section_view(query.from_user.id, topic_key)
     # Telegram ограничивает сообщения 4096 символами
     if len(full_text) > 4000:
         full_text = full_text[:3990] + "..."
+    if new_achievements:
+        full_text += "\n\n\U0001f3c6 <b>Новые достижения:</b> " + "  ".join(new_achievements)
 
     await query.edit_message_text(
         full_text,
@@ -1,11 +1,17 @@
 """Опросы — встроенные Telegram-опросы."""
 
+import logging
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputPollOption
 from telegram.ext import ContextTypes
 
 from config import MAIN_MENU, POLL_SELECT
 from data.content import POLLS
-from database import increment_stat, update_user_score
+from database import (
+    POLL_ANSWER_POINTS, record_poll_answer, register_sent_poll, check_poll_counts,
+)
+
+logger = logging.getLogger(__name__)
 
 
 async def poll_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -26,7 +32,7 @@ async def poll_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = (
         "\U0001f4ca <b>Опросы</b>\n\n"
         "Выбери опрос и поделись своим мнением!\n"
-        "За каждый ответ ты получишь <b>+2 балла</b> \U0001f4b0"
+        f"За каждый ответ ты получишь <b>+{POLL_ANSWER_POINTS} балла</b> \U0001f4b0"
     )
     if query:
         await query.edit_message_text(
@@ -43,7 +49,7 @@ async def poll_send(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    poll_idx = int(query.data.split(":")[1])
+    poll_idx = context.args[0]
     if poll_idx >= len(POLLS):
         return POLL_SELECT
 
@@ -57,13 +63,15 @@ async def poll_send(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Отправляем нативный Telegram-опрос (PTB 22.x требует InputPollOption)
     options = [InputPollOption(text=opt) for opt in poll_data["options"]]
-    await context.bot.send_poll(
+    message = await context.bot.send_poll(
         chat_id=query.message.chat_id,
         question=poll_data["question"],
         options=options,
         is_anonymous=poll_data.get("is_anonymous", False),
         type="regular",
     )
+    # Ответ придёт апдейтом poll_answer только с id опроса Telegram
+    await register_sent_poll(message.poll.id, poll_data["id"], query.from_user.id)
 
     # Кнопка возврата
     keyboard = [
@@ -72,12 +80,24 @@ async def poll_send(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ]
     await context.bot.send_message(
         chat_id=query.message.chat_id,
-        text="\u2705 Спасибо за участие в опросе!",
+        text=f"\u261d\ufe0f Выбери ответ в опросе выше — за него начислим +{POLL_ANSWER_POINTS} балла!",
         reply_markup=InlineKeyboardMarkup(keyboard),
     )
 
-    # Начислить баллы
-    await update_user_score(query.from_user.id, 2)
-    await increment_stat(query.from_user.id, "polls_answered")
-
     return MAIN_MENU
+
+
+async def poll_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Ответ на опрос приходит вне диалога, без чата и сообщения."""
+    answer = update.poll_answer
+    if answer.user is None:
+        # Голос от имени канала — баллы начислять некому
+        return
+    await record_poll_answer(answer.user.id, answer.poll_id, answer.option_ids)
+
+
+async def poll_counts_check(context: ContextTypes.DEFAULT_TYPE):
+    """Задача JobQueue: пересобирает счётчики результатов, если они разошлись с ответами."""
+    mismatched = await check_poll_counts()
+    if mismatched:
+        logger.warning("Счётчики опросов расходились с ответами (строк: %d), пересобраны", mismatched)
@@ -1,59 +1,45 @@
 """Профиль пользователя, рейтинг, факт дня, тест профориентации."""
 
 import random
-from collections import Counter
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from config import (
     MAIN_MENU, PROFILE_VIEW, LEADERBOARD, FACT_OF_DAY,
-    CAREER_TEST, CAREER_TEST_PLAY,
+    CAREER_TEST, CAREER_TEST_PLAY, LEADERBOARD_CACHE_TTL,
 )
 from database import (
-    get_user, get_leaderboard, get_user_achievements,
-    get_user_quiz_results, update_user_score, grant_achievement,
+    get_profile_snapshot, profile_version, complete_career_test, CAREER_TEST_POINTS,
+    is_fact_subscriber, set_fact_subscription,
 )
 from data.content import (
     DAILY_FACTS, CAREER_TEST_QUESTIONS, CAREER_RESULTS, ACHIEVEMENTS,
 )
+from facts import fact_for_date, today
+from ranking import rank_index
+from render_cache import render_cache
+from sessions import CareerSession
 
+LEADERBOARD_SIZE = 10
 
-# ── Профиль ──
-
-async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    if query:
-        await query.answer()
-
-    user_id = update.effective_user.id
-    user = await get_user(user_id)
-
-    if not user:
-        text = "Профиль не найден. Нажми /start чтобы зарегистрироваться."
-        if query:
-            await query.edit_message_text(text)
-        else:
-            await update.message.reply_text(text)
-        return MAIN_MENU
 
-    achievements = await get_user_achievements(user_id)
-    quiz_results = await get_user_quiz_results(user_id)
+# ── Профиль ──
 
+def _render_profile(snapshot: dict):
+    user = snapshot["user"]
     name = user.get("first_name") or user.get("username") or "Пользователь"
 
     # Формируем значки достижений
-    badges_text = ""
-    if achievements:
-        badges = [a["badge_name"] for a in achievements]
-        badges_text = "  ".join(badges)
+    if snapshot["badges"]:
+        badges_text = "  ".join(snapshot["badges"])
     else:
         badges_text = "<i>Пока нет достижений</i>"
 
     # Последние результаты викторин
     quiz_text = ""
-    if quiz_results:
-        for qr in quiz_results[:3]:
+    if snapshot["recent_results"]:
+        for qr in snapshot["recent_results"]:
             quiz_text += f"  \u2022 {qr['title']}: {qr['score']}/{qr['total']}\n"
     else:
         quiz_text = "  <i>Ещё не проходил(а) викторины</i>\n"
@@ -69,10 +55,18 @@ async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         rank = "\U0001f476 Новичок"
 
+    position = snapshot["rank"]
+    position_text = (
+        f"\U0001f3c6 Место в рейтинге: <b>{position}</b> из {snapshot['players']}\n"
+        if position else ""
+    )
+
     text = (
         f"\U0001f464 <b>Профиль: {name}</b>\n\n"
         f"\U0001f3c5 Ранг: {rank}\n"
         f"\U0001f4b0 Баллы: <b>{score}</b>\n"
+        f"{position_text}"
+        f"\U0001f525 Дней подряд: <b>{user.get('streak_days') or 0}</b>\n"
         f"\U0001f3af Викторин пройдено: <b>{user.get('quizzes_completed', 0)}</b>\n"
         f"\U0001f5fa Квестов пройдено: <b>{user.get('quests_completed', 0)}</b>\n"
         f"\U0001f4ca Опросов: <b>{user.get('polls_answered', 0)}</b>\n\n"
@@ -84,50 +78,81 @@ async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("\U0001f3c6 Рейтинг игроков", callback_data="leaderboard")],
         [InlineKeyboardButton("\U0001f3e0 Главное меню", callback_data="back_to_menu")],
     ]
+    return text, InlineKeyboardMarkup(keyboard)
+
 
+async def profile(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
     if query:
-        await query.edit_message_text(
-            text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML"
-        )
+        await query.answer()
+
+    user_id = update.effective_user.id
+    # Место в рейтинге меняется и от чужих баллов, поэтому входит в версию
+    version = (profile_version(user_id), rank_index.rank(user_id), len(rank_index))
+    screen = render_cache.get("profile", user_id, version)
+
+    if screen is None:
+        snapshot = await get_profile_snapshot(user_id, recent=3)
+        if not snapshot:
+            text = "Профиль не найден. Нажми /start чтобы зарегистрироваться."
+            if query:
+                await query.edit_message_text(text)
+            else:
+                await update.message.reply_text(text)
+            return MAIN_MENU
+        screen = _render_profile(snapshot)
+        render_cache.put("profile", user_id, screen, version)
+
+    text, markup = screen
+    if query:
+        await query.edit_message_text(text, reply_markup=markup, parse_mode="HTML")
     else:
-        await update.message.reply_text(
-            text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML"
-        )
+        await update.message.reply_text(text, reply_markup=markup, parse_mode="HTML")
     return PROFILE_VIEW
 
 
 # ── Рейтинг ──
 
+def _render_leaderboard_top() -> str:
+    leaders = rank_index.top(LEADERBOARD_SIZE)
+    if not leaders:
+        return "\U0001f3c6 <b>Рейтинг</b>\n\nПока никто не набрал баллов."
+
+    text = "\U0001f3c6 <b>Рейтинг лучших игроков</b>\n\n"
+    medals = ["\U0001f947", "\U0001f948", "\U0001f949"]
+    for i, leader in enumerate(leaders):
+        name = leader["name"] or "Аноним"
+        medal = medals[i] if i < 3 else f"  {i + 1}."
+        text += f"{medal} <b>{name}</b> — {leader['score']} баллов\n"
+    return text
+
+
+LEADERBOARD_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("\U0001f464 Мой профиль", callback_data="profile")],
+    [InlineKeyboardButton("\U0001f3e0 Главное меню", callback_data="back_to_menu")],
+])
+
+
 async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     if query:
         await query.answer()
 
-    leaders = await get_leaderboard(10)
-
-    if not leaders:
-        text = "\U0001f3c6 <b>Рейтинг</b>\n\nПока никто не набрал баллов."
-    else:
-        text = "\U0001f3c6 <b>Рейтинг лучших игроков</b>\n\n"
-        medals = ["\U0001f947", "\U0001f948", "\U0001f949"]
-        for i, leader in enumerate(leaders):
-            name = leader.get("first_name") or leader.get("username") or "Аноним"
-            medal = medals[i] if i < 3 else f"  {i + 1}."
-            text += f"{medal} <b>{name}</b> — {leader['score']} баллов\n"
+    # Топ общий для всех и может отставать от баллов на LEADERBOARD_CACHE_TTL секунд
+    text = render_cache.get("leaderboard", None)
+    if text is None:
+        text = _render_leaderboard_top()
+        render_cache.put("leaderboard", None, text, ttl=LEADERBOARD_CACHE_TTL)
 
-    keyboard = [
-        [InlineKeyboardButton("\U0001f464 Мой профиль", callback_data="profile")],
-        [InlineKeyboardButton("\U0001f3e0 Главное меню", callback_data="back_to_menu")],
-    ]
+    # Своё место показываем, даже если игрок не попал в топ
+    position = rank_index.rank(update.effective_user.id)
+    if position and position > LEADERBOARD_SIZE:
+        text += f"\n<i>Твоё место: <b>{position}</b> из {len(rank_index)}</i>\n"
 
     if query:
-        await query.edit_message_text(
-            text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML"
-        )
+        await query.edit_message_text(text, reply_markup=LEADERBOARD_KEYBOARD, parse_mode="HTML")
     else:
-        await update.message.reply_text(
-            text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML"
-        )
+        await update.message.reply_text(text, reply_markup=LEADERBOARD_KEYBOARD, parse_mode="HTML")
     return LEADERBOARD
 
 
@@ -138,16 +163,32 @@ async def fact_of_day(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query:
         await query.answer()
 
-    fact = random.choice(DAILY_FACTS)
+    user_id = update.effective_user.id
+    if query and query.data == "fact_subscribe":
+        subscribed = not await is_fact_subscriber(user_id)
+        await set_fact_subscription(user_id, subscribed)
+    else:
+        subscribed = await is_fact_subscriber(user_id)
 
-    text = (
-        "\U0001f4a1 <b>Факт дня</b>\n\n"
-        f"{fact}\n\n"
-        "<i>Нажми ещё раз, чтобы узнать новый факт!</i>"
-    )
+    if query and query.data == "fact_more":
+        title = "\U0001f4a1 <b>Случайный факт</b>"
+        fact = random.choice(DAILY_FACTS)
+    else:
+        title = "\U0001f4a1 <b>Факт дня</b>"
+        fact = fact_for_date(today())
+
+    text = f"{title}\n\n{fact}\n\n"
+    if subscribed:
+        text += "<i>Ты подписан: новый факт будет приходить каждый день.</i>"
+    else:
+        text += "<i>Подпишись, чтобы получать факт дня каждый день!</i>"
 
     keyboard = [
-        [InlineKeyboardButton("\U0001f504 Ещё факт", callback_data="fact_of_day")],
+        [InlineKeyboardButton("\U0001f504 Ещё факт", callback_data="fact_more")],
+        [InlineKeyboardButton(
+            "\U0001f515 Отписаться" if subscribed else "\U0001f514 Присылать каждый день",
+            callback_data="fact_subscribe",
+        )],
         [InlineKeyboardButton("\U0001f3e0 Главное меню", callback_data="back_to_menu")],
     ]
 
@@ -169,10 +210,7 @@ async def career_test_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query:
         await query.answer()
 
-    context.user_data["career_state"] = {
-        "current": 0,
-        "tags": [],
-    }
+    context.user_data["career_state"] = CareerSession()
 
     text = (
         "\U0001f3af <b>Тест: Какая профессия тебе подходит?</b>\n\n"
@@ -201,7 +239,7 @@ async def career_next_question(update: Update, context: ContextTypes.DEFAULT_TYP
     if not state:
         return MAIN_MENU
 
-    idx = state["current"]
+    idx = state.current
 
     if idx >= len(CAREER_TEST_QUESTIONS):
         return await _career_results(query, context)
@@ -236,15 +274,13 @@ async def career_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not state:
         return MAIN_MENU
 
-    answer_idx = int(query.data.split(":")[1])
-    idx = state["current"]
-    q = CAREER_TEST_QUESTIONS[idx]
+    answer_idx = context.args[0]
+    q = CAREER_TEST_QUESTIONS[state.current]
 
-    tags = q["answers"][answer_idx]["tags"]
-    state["tags"].extend(tags)
-    state["current"] += 1
+    state.add_tags(q["answers"][answer_idx]["tags"])
+    state.current += 1
 
-    if state["current"] >= len(CAREER_TEST_QUESTIONS):
+    if state.current >= len(CAREER_TEST_QUESTIONS):
         return await _career_results(query, context)
 
     # Показать следующий вопрос
@@ -253,17 +289,13 @@ async def career_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def _career_results(query, context: ContextTypes.DEFAULT_TYPE):
     state = context.user_data["career_state"]
-    tag_counts = Counter(state["tags"])
 
-    if not tag_counts:
-        top_tag = "engineer"
-    else:
-        top_tag = tag_counts.most_common(1)[0][0]
+    # Все подходящие профессии (топ-3)
+    top_3 = state.most_common(3)
+    top_tag = top_3[0][0] if top_3 else "engineer"
 
     result = CAREER_RESULTS.get(top_tag, CAREER_RESULTS["engineer"])
 
-    # Все подходящие профессии (топ-3)
-    top_3 = tag_counts.most_common(3)
     alternatives = ""
     if len(top_3) > 1:
         alternatives = "\n\n<b>Также тебе могут подойти:</b>\n"
@@ -278,12 +310,14 @@ async def _career_results(query, context: ContextTypes.DEFAULT_TYPE):
         f"<b>{result['title']}</b>\n\n"
         f"{result['description']}"
         f"{alternatives}\n\n"
-        f"\U0001f4b0 <b>+5 баллов</b> за прохождение теста!"
+        f"\U0001f4b0 <b>+{CAREER_TEST_POINTS} баллов</b> за прохождение теста!"
     )
 
     user_id = query.from_user.id
-    await update_user_score(user_id, 5)
-    await grant_achievement(user_id, "career_found", "\U0001f3af Профориентация")
+    new_achievements = await complete_career_test(user_id)
+    if new_achievements:
+        text += "\n\n\U0001f3c6 <b>Новые достижения:</b>\n"
+        text += "\n".join(f"  {ach}" for ach in new_achievements)
 
     keyboard = [
         [InlineKeyboardButton("\U0001f504 Пройти ещё раз", callback_data="career_test")],
@@ -1,15 +1,12 @@
 """Система квестов — выбор, прохождение по шагам, подсказки."""
 
-import json
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from config import MAIN_MENU, QUEST_SELECT, QUEST_PLAY
-from database import (
-    get_all_quests, get_quest, get_quest_progress,
-    start_quest, advance_quest, update_user_score,
-    increment_stat, grant_achievement,
-)
+from catalog import catalog
+from database import get_quest_progress, start_quest, advance_quest, complete_quest
+from sessions import QuestSession
 
 
 async def quest_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -17,7 +14,7 @@ async def quest_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query:
         await query.answer()
 
-    quests = await get_all_quests()
+    quests = await catalog.quests()
     if not quests:
         text = "\U0001f5fa <b>Квесты</b>\n\nПока нет доступных квестов."
         kb = [[InlineKeyboardButton("\u2b05\ufe0f Назад", callback_data="back_to_menu")]]
@@ -29,11 +26,10 @@ async def quest_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     keyboard = []
     for q in quests:
-        steps = json.loads(q["steps"])
         keyboard.append([
             InlineKeyboardButton(
-                f"{q['title']} ({len(steps)} этапов, +{q['reward_points']} баллов)",
-                callback_data=f"quest_begin:{q['id']}"
+                f"{q.title} ({q.step_count} этапов, +{q.reward_points} баллов)",
+                callback_data=f"quest_begin:{q.id}"
             )
         ])
     keyboard.append([InlineKeyboardButton("\u2b05\ufe0f Назад", callback_data="back_to_menu")])
@@ -55,13 +51,12 @@ async def quest_begin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    quest_id = int(query.data.split(":")[1])
-    quest = await get_quest(quest_id)
+    quest_id = context.args[0]
+    quest = await catalog.quest(quest_id)
     if not quest:
         await query.edit_message_text("Квест не найден.")
         return MAIN_MENU
 
-    steps = json.loads(quest["steps"])
     user_id = query.from_user.id
 
     # Проверяем, есть ли уже прогресс
@@ -72,29 +67,39 @@ async def quest_begin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         current_step = progress["current_step"]
 
-    context.user_data["quest_state"] = {
-        "quest_id": quest_id,
-        "title": quest["title"],
-        "steps": steps,
-        "current_step": current_step,
-        "reward_points": quest["reward_points"],
-    }
+    # В сессии только ссылка на квест: этапы общие для всех игроков
+    context.user_data["quest_state"] = QuestSession(quest_id, quest.revision, current_step)
 
-    return await _show_quest_step(query, context)
+    return await _show_quest_step(query, context, quest)
 
 
-async def _show_quest_step(query_or_message, context: ContextTypes.DEFAULT_TYPE, is_message=False):
+QUEST_CHANGED_TEXT = "Квест был изменён. Начни его заново из списка квестов."
+
+
+async def _session_quest(context: ContextTypes.DEFAULT_TYPE):
+    """Квест текущей игры или None, если игры нет или квест исчез."""
+    state = context.user_data.get("quest_state")
+    if not state:
+        return None
+
+    quest = await catalog.quest_revision(state.quest_id, state.revision)
+    if quest is None:
+        context.user_data.pop("quest_state", None)
+    return quest
+
+
+async def _show_quest_step(query_or_message, context: ContextTypes.DEFAULT_TYPE, quest, is_message=False):
     state = context.user_data["quest_state"]
-    idx = state["current_step"]
-    step = state["steps"][idx]
+    idx = state.current_step
+    step = quest.steps[idx]
 
-    progress = f"Этап {idx + 1}/{len(state['steps'])}"
-    progress_bar = "\u2588" * (idx + 1) + "\u2591" * (len(state["steps"]) - idx - 1)
+    progress = f"Этап {idx + 1}/{quest.step_count}"
+    progress_bar = "\u2588" * (idx + 1) + "\u2591" * (quest.step_count - idx - 1)
 
     text = (
-        f"\U0001f5fa <b>{state['title']}</b>\n"
+        f"\U0001f5fa <b>{quest.title}</b>\n"
         f"<i>{progress}</i> {progress_bar}\n\n"
-        f"{step['text']}"
+        f"{step.text}"
     )
 
     keyboard = [
@@ -117,12 +122,15 @@ async def quest_hint(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    state = context.user_data.get("quest_state")
-    if not state:
+    had_session = "quest_state" in context.user_data
+    quest = await _session_quest(context)
+    if not quest:
+        if had_session:
+            await query.message.reply_text(QUEST_CHANGED_TEXT)
         return MAIN_MENU
 
-    step = state["steps"][state["current_step"]]
-    hint = step.get("hint", "Подсказок нет для этого этапа.")
+    step = quest.steps[context.user_data["quest_state"].current_step]
+    hint = step.hint or "Подсказок нет для этого этапа."
 
     keyboard = [
         [InlineKeyboardButton("\u274c Выйти из квеста", callback_data="quest_list")],
@@ -137,33 +145,33 @@ async def quest_hint(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def quest_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка текстового ответа в квесте."""
-    state = context.user_data.get("quest_state")
-    if not state:
+    had_session = "quest_state" in context.user_data
+    quest = await _session_quest(context)
+    if not quest:
+        if had_session:
+            await update.message.reply_text(QUEST_CHANGED_TEXT)
         return MAIN_MENU
 
+    state = context.user_data["quest_state"]
     user_answer = update.message.text.strip().lower()
-    step = state["steps"][state["current_step"]]
-    correct_answer = step["answer"].strip().lower()
+    step = quest.steps[state.current_step]
+    correct_answer = step.answer.strip().lower()
 
     user_id = update.effective_user.id
 
     if user_answer == correct_answer:
-        state["current_step"] += 1
+        state.current_step += 1
 
-        if state["current_step"] >= len(state["steps"]):
+        if state.current_step >= quest.step_count:
             # Квест завершён!
-            await advance_quest(user_id, state["quest_id"], state["current_step"], completed=True)
-            await update_user_score(user_id, state["reward_points"])
-            await increment_stat(user_id, "quests_completed")
-
-            new_achievements = []
-            if await grant_achievement(user_id, "first_quest", "\U0001f5fa Первый квест"):
-                new_achievements.append("\U0001f5fa Первый квест")
+            new_achievements = await complete_quest(
+                user_id, state.quest_id, state.current_step, quest.reward_points
+            )
 
             text = (
-                f"\U0001f389 <b>Квест «{state['title']}» пройден!</b>\n\n"
+                f"\U0001f389 <b>Квест «{quest.title}» пройден!</b>\n\n"
                 f"\u2705 Все этапы завершены!\n"
-                f"\U0001f4b0 Награда: <b>+{state['reward_points']} баллов</b>\n"
+                f"\U0001f4b0 Награда: <b>+{quest.reward_points} баллов</b>\n"
             )
             if new_achievements:
                 text += "\n\U0001f3c6 <b>Новые достижения:</b>\n"
@@ -181,13 +189,13 @@ async def quest_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return MAIN_MENU
         else:
-            await advance_quest(user_id, state["quest_id"], state["current_step"])
+            await advance_quest(user_id, state.quest_id, state.current_step)
 
             await update.message.reply_text(
                 "\u2705 <b>Правильно! Молодец!</b>\n\nПереходим к следующему этапу...",
                 parse_mode="HTML",
             )
-            return await _show_quest_step(update.message, context, is_message=True)
+            return await _show_quest_step(update.message, context, quest, is_message=True)
     else:
         keyboard = [
             [InlineKeyboardButton("\U0001f4a1 Подсказка", callback_data="quest_hint")],
@@ -1,14 +1,12 @@
 """Система викторин — выбор, прохождение, результаты."""
 
-import json
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from config import MAIN_MENU, QUIZ_SELECT, QUIZ_PLAY
-from database import (
-    get_all_quizzes, get_quiz, save_quiz_result,
-    update_user_score, increment_stat, grant_achievement,
-)
+from catalog import catalog
+from database import complete_quiz, QUIZ_POINTS_PER_ANSWER
+from sessions import QuizSession
 
 
 async def quiz_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -16,7 +14,7 @@ async def quiz_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query:
         await query.answer()
 
-    quizzes = await get_all_quizzes()
+    quizzes = await catalog.quizzes()
     if not quizzes:
         text = "\U0001f3af <b>Викторины</b>\n\nПока нет доступных викторин."
         kb = [[InlineKeyboardButton("\u2b05\ufe0f Назад", callback_data="back_to_menu")]]
@@ -28,11 +26,10 @@ async def quiz_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     keyboard = []
     for q in quizzes:
-        questions = json.loads(q["questions"])
         keyboard.append([
             InlineKeyboardButton(
-                f"{q['title']} ({len(questions)} вопросов)",
-                callback_data=f"quiz_start:{q['id']}"
+                f"{q.title} ({q.question_count} вопросов)",
+                callback_data=f"quiz_start:{q.id}"
             )
         ])
     keyboard.append([InlineKeyboardButton("\u2b05\ufe0f Назад", callback_data="back_to_menu")])
@@ -53,32 +50,42 @@ async def quiz_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    quiz_id = int(query.data.split(":")[1])
-    quiz = await get_quiz(quiz_id)
+    quiz_id = context.args[0]
+    quiz = await catalog.quiz(quiz_id)
     if not quiz:
         await query.edit_message_text("Викторина не найдена.")
         return MAIN_MENU
 
-    questions = json.loads(quiz["questions"])
-    context.user_data["quiz_state"] = {
-        "quiz_id": quiz_id,
-        "title": quiz["title"],
-        "questions": questions,
-        "current": 0,
-        "score": 0,
-        "total": len(questions),
-    }
+    # В сессии только ссылка на викторину: сами вопросы общие для всех игроков
+    context.user_data["quiz_state"] = QuizSession(quiz_id, quiz.revision)
 
-    return await _show_question(query, context)
+    return await _show_question(query, context, quiz)
 
 
-async def _show_question(query, context: ContextTypes.DEFAULT_TYPE):
+async def _session_quiz(query, context: ContextTypes.DEFAULT_TYPE):
+    """Викторина текущей игры или None, если игры нет или викторина исчезла."""
+    state = context.user_data.get("quiz_state")
+    if not state:
+        return None
+
+    quiz = await catalog.quiz_revision(state.quiz_id, state.revision)
+    if quiz is None:
+        context.user_data.pop("quiz_state", None)
+        keyboard = [[InlineKeyboardButton("\U0001f4cb Все викторины", callback_data="quiz_list")]]
+        await query.edit_message_text(
+            "Викторина была изменена. Начни её заново из списка.",
+            reply_markup=InlineKeyboardMarkup(keyboard),
+        )
+    return quiz
+
+
+async def _show_question(query, context: ContextTypes.DEFAULT_TYPE, quiz):
     state = context.user_data["quiz_state"]
-    idx = state["current"]
-    q = state["questions"][idx]
+    idx = state.current
+    q = quiz.questions[idx]
 
     keyboard = []
-    for i, option in enumerate(q["options"]):
+    for i, option in enumerate(q.options):
         emoji = ["A", "B", "C", "D"][i] if i < 4 else str(i + 1)
         keyboard.append([
             InlineKeyboardButton(
@@ -87,12 +94,12 @@ async def _show_question(query, context: ContextTypes.DEFAULT_TYPE):
             )
         ])
 
-    progress_bar = _progress_bar(idx, state["total"])
+    progress_bar = _progress_bar(idx, quiz.question_count)
     text = (
-        f"\U0001f3af <b>{state['title']}</b>\n\n"
-        f"<b>Вопрос {idx + 1}/{state['total']}</b>\n"
+        f"\U0001f3af <b>{quiz.title}</b>\n\n"
+        f"<b>Вопрос {idx + 1}/{quiz.question_count}</b>\n"
         f"{progress_bar}\n\n"
-        f"{q['text']}"
+        f"{q.text}"
     )
     await query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML")
     return QUIZ_PLAY
@@ -107,65 +114,58 @@ async def quiz_answer(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
 
-    state = context.user_data.get("quiz_state")
-    if not state:
+    quiz = await _session_quiz(query, context)
+    if not quiz:
         return MAIN_MENU
 
-    answer_idx = int(query.data.split(":")[1])
-    q = state["questions"][state["current"]]
-    correct = q["correct"]
+    state = context.user_data["quiz_state"]
+    answer_idx = context.args[0]
+    q = quiz.questions[state.current]
+    correct = q.correct
     is_correct = answer_idx == correct
 
     if is_correct:
-        state["score"] += 1
+        state.score += 1
         result_text = "\u2705 <b>Правильно!</b>"
     else:
-        correct_text = q["options"][correct]
+        correct_text = q.options[correct]
         result_text = f"\u274c <b>Неправильно!</b>\nПравильный ответ: <b>{correct_text}</b>"
 
-    explanation = q.get("explanation", "")
-    if explanation:
-        result_text += f"\n\n\U0001f4a1 {explanation}"
+    if q.explanation:
+        result_text += f"\n\n\U0001f4a1 {q.explanation}"
 
-    state["current"] += 1
+    state.current += 1
 
-    if state["current"] < state["total"]:
+    if state.current < quiz.question_count:
         keyboard = [[InlineKeyboardButton("Следующий вопрос \u27a1\ufe0f", callback_data="quiz_next")]]
         await query.edit_message_text(
             result_text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="HTML"
         )
         return QUIZ_PLAY
     else:
-        return await _show_results(query, context)
+        return await _show_results(query, context, quiz)
 
 
 async def quiz_next(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    return await _show_question(query, context)
+
+    quiz = await _session_quiz(query, context)
+    if not quiz:
+        return MAIN_MENU
+    return await _show_question(query, context, quiz)
 
 
-async def _show_results(query, context: ContextTypes.DEFAULT_TYPE):
+async def _show_results(query, context: ContextTypes.DEFAULT_TYPE, quiz):
     state = context.user_data["quiz_state"]
-    score = state["score"]
-    total = state["total"]
+    score = state.score
+    total = quiz.question_count
     percentage = int((score / total) * 100) if total > 0 else 0
     user_id = query.from_user.id
 
-    # Начисляем баллы
-    points = score * 5
-    await update_user_score(user_id, points)
-    await save_quiz_result(user_id, state["quiz_id"], score, total)
-    await increment_stat(user_id, "quizzes_completed")
-
-    # Достижения
-    new_achievements = []
-    if await grant_achievement(user_id, "first_quiz", "\U0001f3c5 Первая викторина"):
-        new_achievements.append("\U0001f3c5 Первая викторина")
-
-    if percentage == 100:
-        if await grant_achievement(user_id, "perfect_score", "\U0001f4af Идеальный результат"):
-            new_achievements.append("\U0001f4af Идеальный результат")
+    # Баллы, результат и достижения — одной транзакцией
+    points = score * QUIZ_POINTS_PER_ANSWER
+    new_achievements = await complete_quiz(user_id, state.quiz_id, score, total)
 
     # Оценка
     if percentage >= 80:
@@ -182,7 +182,7 @@ async def _show_results(query, context: ContextTypes.DEFAULT_TYPE):
         comment = "Попробуй ещё раз!"
 
     text = (
-        f"\U0001f3c1 <b>Результаты: {state['title']}</b>\n\n"
+        f"\U0001f3c1 <b>Результаты: {quiz.title}</b>\n\n"
         f"{emoji} {comment}\n\n"
         f"Правильных ответов: <b>{score}/{total}</b> ({percentage}%)\n"
         f"Баллы: <b>+{points}</b> \U0001f4b0\n"
@@ -194,7 +194,7 @@ async def _show_results(query, context: ContextTypes.DEFAULT_TYPE):
             text += f"  {ach}\n"
 
     keyboard = [
-        [InlineKeyboardButton("\U0001f504 Пройти ещё раз", callback_data=f"quiz_start:{state['quiz_id']}")],
+        [InlineKeyboardButton("\U0001f504 Пройти ещё раз", callback_data=f"quiz_start:{state.quiz_id}")],
         [InlineKeyboardButton("\U0001f4cb Все викторины", callback_data="quiz_list")],
         [InlineKeyboardButton("\U0001f3e0 Главное меню", callback_data="back_to_menu")],
     ]
@@ -4,7 +4,7 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
 from config import MAIN_MENU, PROFILE_VIEW, LEADERBOARD, FACT_OF_DAY, CAREER_TEST
-from database import get_or_create_user
+from database import ensure_user
 
 
 def main_menu_keyboard():
@@ -39,7 +39,7 @@ WELCOME_TEXT = (
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    await get_or_create_user(
+    await ensure_user(
         user_id=user.id,
         username=user.username,
         first_name=user.first_name,
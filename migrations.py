@@ -0,0 +1,228 @@
+"""Версионированные миграции схемы SQLite.
+
+Текущая версия схемы хранится в ``PRAGMA user_version``. При старте
+применяются все миграции с номером больше текущего — каждая в своей
+транзакции вместе с обновлением версии. Новые миграции добавляются
+только в конец списка; уже выпущенные не редактируются.
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+MIGRATIONS = [
+    # 1 — исходная схема (IF NOT EXISTS: базы, созданные до миграций, уже её содержат)
+    [
+        """CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            last_name TEXT,
+            score INTEGER DEFAULT 0,
+            quizzes_completed INTEGER DEFAULT 0,
+            quests_completed INTEGER DEFAULT 0,
+            polls_answered INTEGER DEFAULT 0,
+            streak_days INTEGER DEFAULT 0,
+            last_active TEXT,
+            registered_at TEXT DEFAULT (datetime('now'))
+        )""",
+        """CREATE TABLE IF NOT EXISTS quizzes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            questions TEXT NOT NULL,
+            created_by INTEGER,
+            created_at TEXT DEFAULT (datetime('now'))
+        )""",
+        """CREATE TABLE IF NOT EXISTS quiz_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            quiz_id INTEGER,
+            score INTEGER,
+            total INTEGER,
+            completed_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (quiz_id) REFERENCES quizzes(id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS quests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            steps TEXT NOT NULL,
+            reward_points INTEGER DEFAULT 10,
+            created_by INTEGER,
+            created_at TEXT DEFAULT (datetime('now'))
+        )""",
+        """CREATE TABLE IF NOT EXISTS quest_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            quest_id INTEGER,
+            current_step INTEGER DEFAULT 0,
+            completed INTEGER DEFAULT 0,
+            started_at TEXT DEFAULT (datetime('now')),
+            completed_at TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(user_id),
+            FOREIGN KEY (quest_id) REFERENCES quests(id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS poll_responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            poll_id TEXT,
+            answer TEXT,
+            answered_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            badge_id TEXT,
+            badge_name TEXT,
+            earned_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )""",
+    ],
+    # 2 — индексы для профиля, рейтинга и квестов
+    [
+        "CREATE INDEX IF NOT EXISTS idx_quiz_results_user ON quiz_results (user_id, completed_at)",
+        "CREATE INDEX IF NOT EXISTS idx_quest_progress_user ON quest_progress (user_id, quest_id, completed)",
+        "CREATE INDEX IF NOT EXISTS idx_users_score ON users (score)",
+    ],
+    # 3 — один значок на пользователя: убираем дубли и запрещаем новые
+    [
+        """DELETE FROM achievements WHERE id NOT IN (
+            SELECT MIN(id) FROM achievements GROUP BY user_id, badge_id
+        )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_achievements_user_badge ON achievements (user_id, badge_id)",
+    ],
+    # 4 — хранилище состояния бота (user_data, chat_data, диалоги) между рестартами
+    [
+        """CREATE TABLE IF NOT EXISTS persistence_user_data (
+            user_id INTEGER PRIMARY KEY,
+            data BLOB NOT NULL,
+            updated_at INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS persistence_chat_data (
+            chat_id INTEGER PRIMARY KEY,
+            data BLOB NOT NULL,
+            updated_at INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS persistence_conversations (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            user_id INTEGER,
+            state INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (name, key)
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_persistence_conversations_user ON persistence_conversations (user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_persistence_user_data_updated ON persistence_user_data (updated_at)",
+        "CREATE INDEX IF NOT EXISTS idx_persistence_chat_data_updated ON persistence_chat_data (updated_at)",
+        "CREATE INDEX IF NOT EXISTS idx_persistence_conversations_updated ON persistence_conversations (updated_at)",
+    ],
+    # 5 — рассылки с контрольными точками и отметка о заблокировавших бота
+    [
+        "ALTER TABLE users ADD COLUMN blocked_at TEXT",
+        """CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            created_by INTEGER,
+            status TEXT NOT NULL DEFAULT 'running',
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            elapsed REAL NOT NULL DEFAULT 0,
+            status_chat_id INTEGER,
+            status_message_id INTEGER,
+            lease_owner TEXT,
+            lease_until INTEGER NOT NULL DEFAULT 0,
+            created_at TEXT DEFAULT (datetime('now')),
+            finished_at TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_broadcasts_status ON broadcasts (status, lease_until)",
+    ],
+    # 6 — подписка на факт дня, аудитория и темп рассылок, учёт запусков ежедневных задач
+    [
+        """CREATE TABLE IF NOT EXISTS fact_subscriptions (
+            user_id INTEGER PRIMARY KEY,
+            subscribed_at TEXT DEFAULT (datetime('now')),
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )""",
+        "ALTER TABLE broadcasts ADD COLUMN audience TEXT NOT NULL DEFAULT 'all'",
+        "ALTER TABLE broadcasts ADD COLUMN pace REAL NOT NULL DEFAULT 0",
+        """CREATE TABLE IF NOT EXISTS job_runs (
+            name TEXT NOT NULL,
+            run_date TEXT NOT NULL,
+            claimed_at TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (name, run_date)
+        )""",
+    ],
+    # 7 — ответы на опросы — связь опроса Telegram с нашим и один ответ на пользователя
+    [
+        """CREATE TABLE IF NOT EXISTS sent_polls (
+            telegram_poll_id TEXT PRIMARY KEY,
+            poll_id TEXT NOT NULL,
+            user_id INTEGER,
+            sent_at TEXT DEFAULT (datetime('now'))
+        )""",
+        """DELETE FROM poll_responses WHERE id NOT IN (
+            SELECT MIN(id) FROM poll_responses GROUP BY user_id, poll_id
+        )""",
+        """CREATE UNIQUE INDEX IF NOT EXISTS idx_poll_responses_user_poll
+            ON poll_responses(user_id, poll_id)""",
+    ],
+    # 8 — счётчики ответов по вариантам опросов, поддерживаются вместе с ответами
+    [
+        """CREATE TABLE IF NOT EXISTS poll_option_counts (
+            poll_id TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (poll_id, answer)
+        )""",
+        """INSERT OR REPLACE INTO poll_option_counts (poll_id, answer, count)
+            SELECT poll_id, answer, COUNT(*) FROM poll_responses
+            WHERE poll_id IS NOT NULL AND answer IS NOT NULL
+            GROUP BY poll_id, answer""",
+    ],
+    # 9 — изученные темы образования (для достижения «Исследователь»)
+    [
+        """CREATE TABLE IF NOT EXISTS topic_views (
+            user_id INTEGER NOT NULL,
+            topic_id TEXT NOT NULL,
+            viewed_at TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (user_id, topic_id)
+        ) WITHOUT ROWID""",
+    ],
+    # 10 — день последней активности (по TIMEZONE) для серий дней подряд
+    [
+        "ALTER TABLE users ADD COLUMN last_active_day TEXT",
+        "CREATE INDEX IF NOT EXISTS idx_users_streak ON users (last_active_day) WHERE streak_days > 0",
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+async def migrate(db) -> int:
+    """Применяет недостающие миграции и возвращает итоговую версию схемы."""
+    cursor = await db.execute("PRAGMA user_version")
+    version = (await cursor.fetchone())[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Схема БД версии {version} новее, чем поддерживает бот ({SCHEMA_VERSION})"
+        )
+
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        logger.info("Применяется миграция схемы БД №%d", number)
+        await db.execute("BEGIN")
+        try:
+            for statement in MIGRATIONS[number - 1]:
+                await db.execute(statement)
+            await db.execute(f"PRAGMA user_version = {number}")
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+    return SCHEMA_VERSION
@@ -0,0 +1,177 @@
+"""Хранение user_data, chat_data и состояний диалогов в SQLite бота.
+
+После рестарта пользователь продолжает викторину или квест с того же места.
+
+Записи не пишутся после каждого апдейта: ``update_*`` лишь складывают
+последнюю версию данных в буфер (повторные изменения одного ключа
+схлопываются), а раз в ``update_interval`` секунд всё накопленное уходит
+в базу одной транзакцией. Загрузка ленивая: при старте ничего не
+читается, а состояние пользователя подтягивается при его первом апдейте
+(``preload``, TypeHandler в группе -2) — время старта не зависит от
+числа пользователей. Отметки о загрузке снимает ``forget``, когда
+``SessionSweeper`` забывает давно неактивного пользователя, поэтому они не
+копятся за время жизни процесса.
+"""
+
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import BasePersistence, ContextTypes, PersistenceInput
+
+from database import load_bot_state, save_bot_state
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    def __init__(self, update_interval: float = 60, max_age: int = None):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.max_age = max_age
+        self._user_data = {}
+        self._chat_data = {}
+        self._conversations = {}
+        self._loaded_users = set()
+        self._loaded_chats = set()
+        self._pending = None
+
+    # --- Ленивая загрузка ---
+
+    async def preload(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Подтягивает сохранённое состояние пользователя при первом его апдейте."""
+        user, chat = update.effective_user, update.effective_chat
+        if user is None or user.id in self._loaded_users:
+            return
+        chat_id = chat.id if chat is not None and chat.id not in self._loaded_chats else None
+
+        state = await load_bot_state(user.id, chat_id, self.max_age)
+        self._loaded_users.add(user.id)
+        if chat_id is not None:
+            self._loaded_chats.add(chat_id)
+
+        # Данные в памяти новее сохранённых — не перетираем их
+        if state["user_data"]:
+            for k, v in state["user_data"].items():
+                context.user_data.setdefault(k, v)
+        if state["chat_data"] and context.chat_data is not None:
+            for k, v in state["chat_data"].items():
+                context.chat_data.setdefault(k, v)
+        # У Application нет публичного API для подстановки состояния диалога
+        conversations = context.application._conversation_handler_conversations
+        for name, states in state["conversations"].items():
+            if name in conversations:
+                missing = {key: s for key, s in states.items() if key not in conversations[name]}
+                conversations[name].update_no_track(missing)
+
+    def forget(self, user_ids) -> list:
+        """Снимает отметку о загрузке: при следующем апдейте состояние снова прочитается.
+
+        Вызывается для давно неактивных пользователей. Тех, чьи данные ещё
+        ждут записи, пропускает и возвращает — их стоит забыть позже. В
+        личных чатах chat_id совпадает с user_id.
+        """
+        pending = []
+        for user_id in user_ids:
+            if user_id in self._user_data:
+                pending.append(user_id)
+                continue
+            self._loaded_users.discard(user_id)
+            self._loaded_chats.discard(user_id)
+        return pending
+
+    async def get_user_data(self) -> dict:
+        return {}
+
+    async def get_chat_data(self) -> dict:
+        return {}
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    # --- Отложенная запись ---
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._user_data[user_id] = data
+        await self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._user_data[user_id] = None
+        await self._schedule_flush()
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._chat_data[chat_id] = data
+        await self._schedule_flush()
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._chat_data[chat_id] = None
+        await self._schedule_flush()
+
+    async def update_conversation(self, name: str, key: tuple, new_state) -> None:
+        self._conversations[(name, key)] = new_state
+        await self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Общая запись для всех ``update_*`` одного прохода Application.update_persistence."""
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._flush_soon())
+        return asyncio.shield(self._pending)
+
+    async def _flush_soon(self):
+        # Даём остальным update_* этого прохода положить данные в буфер
+        await asyncio.sleep(0)
+        self._pending = None
+        await self._write_batch()
+
+    async def _write_batch(self):
+        user_data, self._user_data = self._user_data, {}
+        chat_data, self._chat_data = self._chat_data, {}
+        conversations, self._conversations = self._conversations, {}
+        if not (user_data or chat_data or conversations):
+            return
+        try:
+            await save_bot_state(user_data, chat_data, conversations, self.max_age)
+        except Exception:
+            # Возвращаем неушедшие изменения, если новых по тем же ключам ещё нет
+            for buffer, batch in (
+                (self._user_data, user_data),
+                (self._chat_data, chat_data),
+                (self._conversations, conversations),
+            ):
+                for key, value in batch.items():
+                    buffer.setdefault(key, value)
+            raise
+        logger.debug(
+            "Состояние сохранено: user_data %d, chat_data %d, диалогов %d",
+            len(user_data), len(chat_data), len(conversations),
+        )
+
+    async def flush(self) -> None:
+        if self._pending is not None:
+            await self._pending
+        await self._write_batch()
+
+    # --- bot_data и callback_data не используются ---
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_callback_data(self, data) -> None:
+        pass
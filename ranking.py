@@ -0,0 +1,60 @@
+"""Рейтинг игроков в памяти процесса.
+
+Пользователи хранятся в отсортированном списке по (-баллы, user_id),
+поэтому топ-N и «моё место» считаются за O(log n) без обращения к SQLite.
+Индекс заполняется из БД при старте и обновляется при каждом изменении баллов.
+"""
+
+from sortedcontainers import SortedList
+
+
+class RankIndex:
+    def __init__(self):
+        self._order = SortedList()
+        # user_id -> [score, display_name]
+        self._users = {}
+
+    def __len__(self):
+        return len(self._users)
+
+    def load(self, rows):
+        """Полностью перестраивает индекс из строк (user_id, name, score)."""
+        self._users = {user_id: [score or 0, name] for user_id, name, score in rows}
+        self._order = SortedList((-score, user_id) for user_id, (score, _) in self._users.items())
+
+    def add_user(self, user_id: int, name: str = None, score: int = 0):
+        entry = self._users.get(user_id)
+        if entry is None:
+            self._users[user_id] = [score, name]
+            self._order.add((-score, user_id))
+        elif name:
+            entry[1] = name
+
+    def add_points(self, user_id: int, delta: int):
+        entry = self._users.get(user_id)
+        if entry is None or not delta:
+            return
+        self._order.remove((-entry[0], user_id))
+        entry[0] += delta
+        self._order.add((-entry[0], user_id))
+
+    def top(self, limit: int) -> list:
+        """Первые ``limit`` игроков: список словарей user_id/name/score."""
+        return [
+            {"user_id": user_id, "name": self._users[user_id][1], "score": -neg_score}
+            for neg_score, user_id in self._order.islice(0, limit)
+        ]
+
+    def score(self, user_id: int) -> int:
+        entry = self._users.get(user_id)
+        return entry[0] if entry is not None else 0
+
+    def rank(self, user_id: int):
+        """Место игрока (с 1) или None, если он не зарегистрирован."""
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        return self._order.index((-entry[0], user_id)) + 1
+
+
+rank_index = RankIndex()
@@ -0,0 +1,197 @@
+"""Ограничение исходящих запросов к Telegram Bot API.
+
+Telegram допускает около 30 сообщений в секунду на бота и около одного в
+секунду в один чат; при превышении отвечает ``RetryAfter``. Лимитер стоит
+на уровне запросов бота (``ApplicationBuilder.rate_limiter``) и держит два
+маркерных ведра: общее и отдельное для каждого чата.
+
+Запросы делятся на две полосы:
+
+* ``interactive`` (по умолчанию) — ответы на действия пользователя;
+* ``background`` — рассылки и прочие фоновые отправки, вызываются с
+  ``rate_limit_args=BACKGROUND``. Фоновая полоса не трогает резерв общего
+  ведра и пропускает вперёд ждущие интерактивные запросы.
+
+После ``RetryAfter`` все запросы ждут указанное Telegram время, а сам
+запрос повторяется. Время ожидания в очереди по полосам копится в
+``rate_limit_stats``.
+"""
+
+import asyncio
+import logging
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now: float, reserve: float = 0) -> float:
+        """Берёт маркер и возвращает 0 или сколько секунд ждать до следующей попытки.
+
+        ``reserve`` маркеров остаются нетронутыми — их может взять только
+        запрос без резерва.
+        """
+        self._refill(now)
+        if self.tokens >= 1 + reserve:
+            self.tokens -= 1
+            return 0
+        return (1 + reserve - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class LaneStats:
+    __slots__ = ("requests", "waited", "total_wait", "max_wait")
+
+    def __init__(self):
+        self.requests = 0
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        self.requests += 1
+        if wait >= 0.001:
+            self.waited += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    @property
+    def avg_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+
+class RateLimitStats:
+    """Метрики лимитера: ожидание по полосам и повторы после RetryAfter."""
+
+    __slots__ = ("lanes", "retries", "gave_up")
+
+    def __init__(self):
+        self.lanes = {INTERACTIVE: LaneStats(), BACKGROUND: LaneStats()}
+        self.retries = 0
+        self.gave_up = 0
+
+
+rate_limit_stats = RateLimitStats()
+
+# Чатов с неполным ведром держим в памяти не больше стольких, дальше чистим
+_CHAT_BUCKETS_SOFT_LIMIT = 10_000
+
+
+class TokenBucketRateLimiter(BaseRateLimiter):
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 background_reserve: float = 10, max_retries: int = 3):
+        # Ведро вмещает не больше ``rate`` маркеров, а запросу нужен целый:
+        # при меньшем лимите ни один запрос не ушёл бы
+        if global_rate < 1:
+            raise ValueError(f"Общий лимит {global_rate:g} запроса/с меньше одного запроса в секунду")
+        if chat_rate <= 0:
+            raise ValueError(f"Лимит на чат должен быть положительным, а не {chat_rate:g}")
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = max(1, chat_burst)
+        # Хотя бы один маркер общего ведра всегда доступен фону
+        self.background_reserve = max(0, min(background_reserve, global_rate - 1))
+        self.max_retries = max_retries
+        self._global = None
+        self._chats = {}
+        self._paused_until = 0.0
+        self._interactive_waiting = 0
+
+    async def initialize(self) -> None:
+        self._global = TokenBucket(self.global_rate, max(1, self.global_rate), self._now())
+
+    async def shutdown(self) -> None:
+        self._chats.clear()
+
+    @staticmethod
+    def _now() -> float:
+        return asyncio.get_running_loop().time()
+
+    def _chat_bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= _CHAT_BUCKETS_SOFT_LIMIT:
+                # Полное ведро ничем не отличается от нового — его можно забыть
+                self._chats = {cid: b for cid, b in self._chats.items() if not b.is_full(now)}
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
+
+    async def _wait_pause(self):
+        while (delay := self._paused_until - self._now()) > 0:
+            await asyncio.sleep(delay)
+
+    async def _acquire(self, chat_id, lane: str):
+        if chat_id is not None:
+            bucket = self._chat_bucket(chat_id, self._now())
+            while (delay := bucket.try_take(self._now())) > 0:
+                await asyncio.sleep(delay)
+        # Фон уступает только тем, кто ждёт общий лимит: ожидание лимита
+        # своего чата (один активный пользователь) рассылки не задерживает
+        if lane == INTERACTIVE:
+            self._interactive_waiting += 1
+        try:
+            while True:
+                await self._wait_pause()
+                if lane == BACKGROUND and self._interactive_waiting:
+                    await asyncio.sleep(1 / self.global_rate)
+                    continue
+                reserve = self.background_reserve if lane == BACKGROUND else 0
+                delay = self._global.try_take(self._now(), reserve)
+                if not delay:
+                    return
+                await asyncio.sleep(delay)
+        finally:
+            if lane == INTERACTIVE:
+                self._interactive_waiting -= 1
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        lane = BACKGROUND if rate_limit_args == BACKGROUND else INTERACTIVE
+        chat_id = data.get("chat_id")
+        # Общие лимиты считаются по сообщениям в чаты; служебные методы
+        # (answerCallbackQuery, getMe, setWebhook…) идут без очереди
+        limited = chat_id is not None
+
+        attempt = 0
+        while True:
+            if limited:
+                started = self._now()
+                await self._acquire(chat_id, lane)
+                rate_limit_stats.lanes[lane].record(self._now() - started)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                retry_after = exc.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                if attempt >= self.max_retries:
+                    rate_limit_stats.gave_up += 1
+                    raise
+                attempt += 1
+                rate_limit_stats.retries += 1
+                logger.warning(
+                    "%s: RetryAfter %.0f с (полоса %s, попытка %d)",
+                    endpoint, retry_after, lane, attempt,
+                )
+                self._paused_until = max(self._paused_until, self._now() + retry_after + 0.1)
+                await self._wait_pause()
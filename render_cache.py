@@ -0,0 +1,61 @@
+"""Готовые экраны (текст и клавиатура) в памяти процесса.
+
+Профиль и рейтинг между нажатиями обычно не меняются, а собираются
+каждый раз заново. Кэш хранит по ключу ``(экран, user_id)`` последний
+собранный экран вместе с версией данных, из которых он собран; при
+несовпадении версии экран собирается заново. Версию профиля двигают
+события в ``database`` (баллы, результаты, значки — см.
+``database.profile_version``).
+
+Общие для всех экраны (топ рейтинга) хранятся с ``user_id=None`` и
+живут ``ttl`` секунд. Размер кэша ограничен, вытесняются давно не
+открывавшиеся экраны.
+"""
+
+import time
+from collections import OrderedDict
+
+from config import RENDER_CACHE_SIZE
+
+
+class RenderCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        # (screen, user_id) -> (version, expires_at, value)
+        self._entries = OrderedDict()
+        self._screens = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, screen: str, user_id, version=None):
+        key = (screen, user_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version or (entry[1] and entry[1] < time.monotonic()):
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, screen: str, user_id, value, version=None, ttl: float = None):
+        key = (screen, user_id)
+        expires_at = time.monotonic() + ttl if ttl else 0
+        self._entries[key] = (version, expires_at, value)
+        self._screens.add(screen)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def forget_user(self, user_id):
+        """Удаляет все экраны пользователя."""
+        for screen in self._screens:
+            self._entries.pop((screen, user_id), None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+render_cache = RenderCache(RENDER_CACHE_SIZE)
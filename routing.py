@@ -0,0 +1,74 @@
+"""Маршрутизация нажатий inline-кнопок.
+
+``callback_data`` кнопок имеет вид ``действие[:арг1[:арг2...]]``. Вместо
+цепочки ``CallbackQueryHandler`` с регулярными выражениями, которые
+ConversationHandler проверяет по очереди (а обработчик потом ещё раз
+делит ``query.data``), состояние обслуживает один ``CallbackRouter``:
+строка разбирается один раз, обработчик находится по действию в
+словаре, а аргументы, уже приведённые к типам из маршрута, лежат в
+``context.args``.
+
+Кнопку с неизвестным действием или неподходящими аргументами роутер не
+принимает — как и несовпавший pattern, она уходит дальше (fallbacks,
+обработчики вне диалога).
+"""
+
+from typing import NamedTuple
+
+from telegram import Update
+from telegram.ext import BaseHandler
+
+
+class Route(NamedTuple):
+    callback: object
+    arg_types: tuple
+
+
+def route(callback, *arg_types) -> Route:
+    """Маршрут: обработчик и типы аргументов после действия (``int``, ``str``)."""
+    return Route(callback, arg_types)
+
+
+def parse_callback_data(data: str, arg_types: tuple):
+    """Приводит аргументы ``callback_data`` к типам маршрута; None — не подходят."""
+    parts = data.split(":")
+    if len(parts) != len(arg_types) + 1:
+        return None
+    args = []
+    for convert, raw in zip(arg_types, parts[1:]):
+        # Как прежний ``\d+``: без знака и пробелов — отрицательный индекс
+        # молча выбрал бы элемент с конца списка
+        if convert is int and not raw.isdecimal():
+            return None
+        args.append(convert(raw))
+    return args
+
+
+class CallbackRouter(BaseHandler):
+    """Один обработчик callback-кнопок состояния со словарём ``действие -> Route``."""
+
+    __slots__ = ("routes",)
+
+    def __init__(self, routes: dict):
+        # Общий callback не нужен: обработчик берётся из маршрута в handle_update
+        super().__init__(None)
+        self.routes = routes
+
+    def check_update(self, update: object):
+        if not isinstance(update, Update) or update.callback_query is None:
+            return None
+        data = update.callback_query.data
+        if not isinstance(data, str):
+            return None
+        found = self.routes.get(data.partition(":")[0])
+        if found is None:
+            return None
+        args = parse_callback_data(data, found.arg_types)
+        if args is None:
+            return None
+        return found.callback, args
+
+    async def handle_update(self, update, application, check_result, context):
+        callback, args = check_result
+        context.args = args
+        return await callback(update, context)
@@ -0,0 +1,285 @@
+"""Компактные объекты игровых сессий, хранимые в ``context.user_data``.
+
+Вместо словарей с повторяющимися строковыми ключами — классы со
+``__slots__``: у экземпляра нет собственного ``__dict__``, поэтому
+десятки тысяч одновременных сессий занимают заметно меньше памяти.
+Замер — ``python -m benchmarks.session_memory``.
+
+``SessionSweeper`` периодически удаляет брошенные сессии и записи
+ConversationHandler, простаивающие дольше таймаута своего состояния.
+"""
+
+import logging
+import time
+from array import array
+
+import telegram
+from telegram import Update
+from telegram.ext import ConversationHandler, ContextTypes
+
+from data.content import CAREER_RESULTS
+from database import save_quest_positions
+
+logger = logging.getLogger(__name__)
+
+# Ключи user_data, под которыми лежат сессии
+SESSION_KEYS = (
+    "quiz_state", "quest_state", "career_state", "admin_quiz", "admin_quest", "admin_broadcast",
+)
+
+
+class QuizSession:
+    __slots__ = ("quiz_id", "revision", "current", "score")
+
+    def __init__(self, quiz_id: int, revision: int):
+        self.quiz_id = quiz_id
+        self.revision = revision
+        self.current = 0
+        self.score = 0
+
+
+class QuestSession:
+    __slots__ = ("quest_id", "revision", "current_step")
+
+    def __init__(self, quest_id: int, revision: int, current_step: int = 0):
+        self.quest_id = quest_id
+        self.revision = revision
+        self.current_step = current_step
+
+
+# Порядок тегов профориентации фиксирован: индекс тега — позиция в счётчике
+CAREER_TAGS = tuple(CAREER_RESULTS)
+_CAREER_TAG_INDEX = {tag: i for i, tag in enumerate(CAREER_TAGS)}
+
+
+class CareerSession:
+    """Тест профориентации: вместо списка тегов — массив счётчиков по тегам."""
+
+    __slots__ = ("current", "tag_counts")
+
+    def __init__(self):
+        self.current = 0
+        self.tag_counts = array("H", bytes(2 * len(CAREER_TAGS)))
+
+    def add_tags(self, tags):
+        for tag in tags:
+            index = _CAREER_TAG_INDEX.get(tag)
+            if index is not None:
+                self.tag_counts[index] += 1
+
+    def most_common(self, n: int = None) -> list:
+        """Пары (тег, количество) по убыванию; при равенстве — в порядке CAREER_TAGS."""
+        ranked = sorted(
+            ((tag, count) for tag, count in zip(CAREER_TAGS, self.tag_counts) if count),
+            key=lambda item: -item[1],
+        )
+        return ranked if n is None else ranked[:n]
+
+
+class QuizDraft:
+    """Викторина, которую администратор собирает в админ-панели."""
+
+    __slots__ = ("title", "questions", "question_text", "options")
+
+    def __init__(self):
+        self.title = None
+        self.questions = []
+        self.question_text = ""
+        self.options = ()
+
+    def add_question(self, correct: int):
+        self.questions.append({
+            "text": self.question_text,
+            "options": list(self.options),
+            "correct": correct,
+            "explanation": "",
+        })
+        self.question_text = ""
+        self.options = ()
+
+
+class QuestDraft:
+    """Квест, который администратор собирает в админ-панели."""
+
+    __slots__ = ("title", "steps", "step_text")
+
+    def __init__(self):
+        self.title = None
+        self.steps = []
+        self.step_text = ""
+
+    def add_step(self, answer: str):
+        self.steps.append({"text": self.step_text, "answer": answer, "hint": ""})
+        self.step_text = ""
+
+
+class SessionStats:
+    """Счётчики для мониторинга: живые сессии и вытеснения."""
+
+    __slots__ = ("live_sessions", "live_conversations", "evicted_sessions", "evicted_conversations")
+
+    def __init__(self):
+        self.live_sessions = 0
+        self.live_conversations = 0
+        self.evicted_sessions = 0
+        self.evicted_conversations = 0
+
+
+session_stats = SessionStats()
+
+
+class ConversationStates:
+    """Обход и завершение диалогов ``ConversationHandler``.
+
+    Публичного API для этого у ConversationHandler нет, поэтому обращения к
+    его внутренностям (``_conversations``, ``_update_state``) собраны здесь.
+    Проверено на python-telegram-bot 22.6 — версия закреплена в
+    requirements.txt и покрыта ``tests/test_sessions.py``; с несовместимой
+    версией класс падает при создании, а не посреди чистки.
+    """
+
+    def __init__(self, conversation: ConversationHandler):
+        if not (
+            hasattr(conversation, "_conversations")
+            and callable(getattr(conversation, "_update_state", None))
+        ):
+            raise RuntimeError(
+                f"ConversationStates не поддерживает python-telegram-bot {telegram.__version__}"
+            )
+        self.conversation = conversation
+
+    @property
+    def _states(self):
+        # Application.initialize подменяет словарь при загрузке из persistence,
+        # поэтому берём его при каждом обращении
+        return self.conversation._conversations
+
+    def items(self):
+        return self._states.items()
+
+    def __iter__(self):
+        return iter(self._states)
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def end(self, key: tuple):
+        """Завершает диалог так же, как обработчик, вернувший END (с записью в persistence)."""
+        self.conversation._update_state(ConversationHandler.END, key)
+
+
+class SessionSweeper:
+    """Вытесняет простаивающие диалоги и их сессии пачкой.
+
+    ``track`` отмечает время последнего апдейта пользователя (TypeHandler
+    в группе -1), ``sweep`` запускается из JobQueue и завершает диалоги,
+    простаивающие дольше таймаута их текущего состояния.
+    """
+
+    def __init__(self, conversation: ConversationHandler, timeouts: dict, default_timeout: int,
+                 persistence=None):
+        self.conversations = ConversationStates(conversation)
+        self.persistence = persistence
+        self.timeouts = timeouts
+        self.default_timeout = default_timeout
+        self._max_timeout = max([default_timeout, *timeouts.values()])
+        self._last_seen = {}
+        # Для диалогов, по которым апдейтов ещё не было (например, после рестарта)
+        self._started = time.monotonic()
+
+    async def track(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if update.effective_user:
+            self._last_seen[update.effective_user.id] = time.monotonic()
+
+    def _idle(self, user_id: int, now: float) -> float:
+        return now - self._last_seen.get(user_id, self._started)
+
+    async def sweep(self, context: ContextTypes.DEFAULT_TYPE):
+        now = time.monotonic()
+        application = context.application
+        conversations = self.conversations
+
+        stale_keys = []
+        for key, state in conversations.items():
+            if not isinstance(state, int):
+                # Неблокирующий обработчик ещё выполняется
+                continue
+            if self._idle(key[-1], now) > self.timeouts.get(state, self.default_timeout):
+                stale_keys.append(key)
+
+        stale_users = {key[-1] for key in stale_keys}
+        active_users = {key[-1] for key in conversations} - stale_users
+        # Сессии без диалога тоже вытесняем по самому длинному таймауту
+        for user_id, data in application.user_data.items():
+            if user_id in active_users or user_id in stale_users:
+                continue
+            if any(k in data for k in SESSION_KEYS) and self._idle(user_id, now) > self._max_timeout:
+                stale_users.add(user_id)
+
+        # Прогресс квестов сохраняем до вытеснения: если запись не удалась,
+        # сессии остаются в памяти до следующего прохода
+        await save_quest_positions(self._quest_positions(application, stale_users))
+        # За время записи пользователь мог вернуться — его сессию не трогаем
+        returned = {user_id for user_id in stale_users if self._idle(user_id, now) < 0}
+        stale_users -= returned
+        stale_keys = [key for key in stale_keys if key[-1] not in returned]
+
+        evicted = self._evict_sessions(application, stale_users)
+        for key in stale_keys:
+            conversations.end(key)
+
+        # Забываем давно неактивных пользователей — здесь и в persistence
+        last_seen, self._last_seen = self._last_seen, {}
+        forgotten = []
+        for user_id, seen in last_seen.items():
+            if now - seen <= self._max_timeout:
+                self._last_seen[user_id] = seen
+            else:
+                forgotten.append(user_id)
+        if self.persistence is not None:
+            # Не записанных ещё пользователей забудем на следующем проходе
+            for user_id in self.persistence.forget(forgotten):
+                self._last_seen[user_id] = last_seen[user_id]
+
+        session_stats.evicted_sessions += evicted
+        session_stats.evicted_conversations += len(stale_keys)
+        session_stats.live_conversations = len(conversations)
+        session_stats.live_sessions = sum(
+            1 for data in application.user_data.values() for k in SESSION_KEYS if k in data
+        )
+        if evicted or stale_keys:
+            logger.info(
+                "Вытеснено сессий: %d, диалогов: %d; активно сессий: %d, диалогов: %d",
+                evicted, len(stale_keys),
+                session_stats.live_sessions, session_stats.live_conversations,
+            )
+
+    @staticmethod
+    def _quest_positions(application, user_ids) -> list:
+        positions = []
+        for user_id in user_ids:
+            quest = application.user_data.get(user_id, {}).get("quest_state")
+            if quest is not None:
+                positions.append((user_id, quest.quest_id, quest.current_step))
+        return positions
+
+    @staticmethod
+    def _evict_sessions(application, user_ids) -> int:
+        evicted = 0
+        changed = []
+        for user_id in user_ids:
+            data = application.user_data.get(user_id)
+            if data is None:
+                continue
+            for k in SESSION_KEYS:
+                if data.pop(k, None) is not None:
+                    evicted += 1
+            if not data:
+                # drop_user_data сам отмечает удаление для persistence
+                application.drop_user_data(user_id)
+            else:
+                changed.append(user_id)
+        # Иначе вытесненные сессии остались бы в сохранённых user_data и
+        # вернулись после рестарта
+        application.mark_data_for_update_persistence(user_ids=changed)
+        return evicted
@@ -0,0 +1,191 @@
+"""Распределение апдейтов по нескольким процессам-воркерам.
+
+Фронтовой процесс получает апдейты (polling или webhook) и раскладывает
+их по воркерам по ``user_id % WORKERS``: все апдейты одного пользователя
+попадают в один процесс, поэтому его диалог, сессии и порядок обработки
+остаются локальными. Каждый воркер — обычный Application с
+``build_conversation_handler()``, своим писателем БД и пулом читателей;
+между процессами SQLite разводит запись блокировкой файла (WAL +
+busy_timeout). Транзакции писателя короткие: ошибок ``database is locked``
+нет, но при плотной записи из нескольких процессов редкие операции ждут
+блокировку до секунды — замер ``python -m benchmarks.shard_writes``.
+
+Фронт не ждёт воркеров: у каждого шарда свой буфер и своя задача, которая
+перекладывает апдейты в очередь процесса. Отстающий шард копит апдейты
+только в своём буфере, а когда и тот полон, его апдейты отбрасываются —
+остальные шарды получают свои без задержки.
+
+Разовые задачи на всю базу (факт дня, возобновление рассылок, ночная
+чистка серий, сверка опросов) запускает только шард 0.
+
+Рейтинг и каталог контента живут в памяти каждого воркера отдельно,
+поэтому воркеры периодически перечитывают их из БД (``refresh_shared_state``):
+чужие баллы и новые викторины видны с задержкой до
+``SHARD_REFRESH_INTERVAL`` секунд.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from database import invalidate_content, load_rank_index
+
+logger = logging.getLogger(__name__)
+
+# Сигнал воркеру завершиться
+_STOP = None
+
+
+def shard_of(update: Update, shards: int) -> int:
+    if update.effective_user is not None:
+        return update.effective_user.id % shards
+    if update.effective_chat is not None:
+        return update.effective_chat.id % shards
+    return 0
+
+
+class ShardRouter:
+    """Фронт: запускает воркеров и передаёт им апдейты через очереди процессов.
+
+    ``factory(shard)`` собирает Application воркера в его процессе.
+    """
+
+    def __init__(self, factory, workers: int, queue_size: int):
+        self.factory = factory
+        self.workers = workers
+        ctx = multiprocessing.get_context("spawn")
+        self.inboxes = [ctx.Queue(maxsize=queue_size) for _ in range(workers)]
+        # Апдейты, ещё не переложенные в очередь процесса шарда
+        self.pending = [asyncio.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.dropped = [0] * workers
+        self._forwarders = []
+        self._closing = threading.Event()
+        self.processes = [
+            ctx.Process(
+                target=run_worker, args=(shard, self.inboxes[shard], factory),
+                name=f"shard-{shard}", daemon=True,
+            )
+            for shard in range(workers)
+        ]
+
+    def start(self):
+        """Запускает процессы и задачи пересылки; вызывается из post_init фронта."""
+        for process in self.processes:
+            process.start()
+        self._forwarders = [
+            asyncio.create_task(self._forward(shard), name=f"shard-{shard}-forward")
+            for shard in range(self.workers)
+        ]
+        logger.info("Запущено воркеров: %d", self.workers)
+
+    async def stop(self, timeout: float = 30):
+        """Досылает буферы, передаёт воркерам сигнал остановки и ждёт их."""
+        for pending in self.pending:
+            if pending.full():
+                # Сигнал остановки важнее самого старого апдейта в буфере
+                pending.get_nowait()
+            pending.put_nowait(_STOP)
+        if self._forwarders:
+            _, stuck = await asyncio.wait(self._forwarders, timeout=timeout)
+            # Пересылка, ждущая места у зависшего воркера, выйдет по флагу
+            self._closing.set()
+            for task in stuck:
+                task.cancel()
+        await asyncio.to_thread(self._join, timeout)
+
+    def _join(self, timeout: float):
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning("Воркер %s не завершился вовремя, останавливаем", process.name)
+                process.terminate()
+
+    def _put(self, inbox, data) -> bool:
+        # Поток исполнителя: ждём места в очереди процесса, пока фронт не закрывается
+        while not self._closing.is_set():
+            try:
+                inbox.put(data, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def _forward(self, shard: int):
+        """Перекладывает апдейты шарда из буфера фронта в очередь его процесса."""
+        inbox, pending = self.inboxes[shard], self.pending[shard]
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await pending.get()
+            if not await loop.run_in_executor(None, self._put, inbox, data):
+                return
+            if data is _STOP:
+                return
+
+    async def route(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """TypeHandler фронта: ставит апдейт в буфер его шарда, не дожидаясь воркера."""
+        shard = shard_of(update, self.workers)
+        try:
+            self.pending[shard].put_nowait(update.to_dict())
+        except asyncio.QueueFull:
+            self.dropped[shard] += 1
+            logger.warning("Шард %d не успевает, апдейт %s отброшен", shard, update.update_id)
+
+    def depths(self) -> list:
+        """Число апдейтов, ожидающих в буфере и очереди каждого шарда."""
+        return [inbox.qsize() + pending.qsize() for inbox, pending in zip(self.inboxes, self.pending)]
+
+    async def report(self, context: ContextTypes.DEFAULT_TYPE):
+        depths = self.depths()
+        dead = [p.name for p in self.processes if not p.is_alive()]
+        logger.info("Очереди шардов: %s", ", ".join(f"{i}={d}" for i, d in enumerate(depths)))
+        if any(self.dropped):
+            logger.warning("Отброшено апдейтов по шардам: %s",
+                           ", ".join(f"{i}={d}" for i, d in enumerate(self.dropped)))
+        if dead:
+            logger.error("Воркеры не работают: %s", ", ".join(dead))
+
+
+async def refresh_shared_state(context: ContextTypes.DEFAULT_TYPE):
+    """Воркер: подтягивает изменения рейтинга и контента из других процессов."""
+    await load_rank_index()
+    invalidate_content()
+
+
+def run_worker(shard: int, inbox, factory):
+    """Точка входа процесса-воркера: ``factory(shard)`` собирает Application без Updater."""
+    # Останавливает воркер фронт (через очередь), а не сигнал терминала
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # Импорт bot.py при распаковке factory уже настроил логирование — заменяем
+    # его формат на формат с номером шарда
+    logging.basicConfig(
+        format=f"%(asctime)s - shard-{shard} - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+        force=True,
+    )
+    asyncio.run(_serve(factory(shard), inbox))
+
+
+async def _serve(application, inbox):
+    loop = asyncio.get_running_loop()
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    try:
+        while True:
+            data = await loop.run_in_executor(None, inbox.get)
+            if data is _STOP:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+    finally:
+        await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
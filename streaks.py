@@ -0,0 +1,73 @@
+"""Серии дней подряд («Заходи 3 дня подряд»).
+
+День считается по ``TIMEZONE``. ``track`` (TypeHandler) помнит для
+каждого пользователя день, когда его активность уже записана, и на
+остальных апдейтах за этот день ограничивается одним сравнением. Первый
+апдейт дня одним UPDATE продлевает серию (если вчера пользователь
+заходил) или начинает её заново и проверяет достижение ``active_user``.
+
+Серии тех, кто пропустил день, обнуляет ночная задача ``reset`` — одним
+UPDATE по всей таблице, без обхода истории.
+"""
+
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dtime, timedelta
+from zoneinfo import ZoneInfo
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from config import TIMEZONE, KNOWN_USERS_CACHE_SIZE
+from database import record_active_day, reset_broken_streaks
+
+tz = ZoneInfo(TIMEZONE)
+
+
+class StreakTracker:
+    def __init__(self, cache_size: int):
+        self.cache_size = cache_size
+        # user_id -> день (toordinal), за который активность уже записана
+        self._recorded = OrderedDict()
+        self._today = None
+        self._day_ends = 0.0
+
+    def _current_day(self) -> int:
+        now = time.time()
+        if now >= self._day_ends:
+            local = datetime.now(tz)
+            midnight = datetime.combine(local.date() + timedelta(days=1), dtime(), tz)
+            self._today = local.date().toordinal()
+            self._day_ends = midnight.timestamp()
+        return self._today
+
+    async def track(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if user is None:
+            return
+        today = self._current_day()
+        if self._recorded.get(user.id) == today:
+            return
+
+        day = date.fromordinal(today)
+        result = await record_active_day(
+            user.id, day.isoformat(), (day - timedelta(days=1)).isoformat()
+        )
+        if result is None:
+            # Пользователь ещё не зарегистрирован — запишем после /start
+            return
+        self._recorded[user.id] = today
+        self._recorded.move_to_end(user.id)
+        if len(self._recorded) > self.cache_size:
+            self._recorded.popitem(last=False)
+
+    async def reset(self, context: ContextTypes.DEFAULT_TYPE):
+        """Задача JobQueue (после полуночи): обнуляет прерванные серии."""
+        yesterday = date.fromordinal(self._current_day() - 1)
+        await reset_broken_streaks(yesterday.isoformat())
+
+
+# Ночная чистка — чуть позже полуночи, когда «вчера» уже закончилось
+RESET_TIME = dtime(0, 5, tzinfo=tz)
+
+streak_tracker = StreakTracker(KNOWN_USERS_CACHE_SIZE)
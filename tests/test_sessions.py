@@ -0,0 +1,126 @@
+"""ConversationStates на закреплённой версии python-telegram-bot и порядок
+шагов SessionSweeper.sweep.
+
+Запуск из корня проекта:
+    python -m pytest tests
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from telegram import Chat, Message, Update, User
+from telegram.ext import Application, CallbackContext, ConversationHandler, MessageHandler, filters
+
+import sessions
+from sessions import ConversationStates, QuestSession, SessionSweeper
+
+STATE = 1
+
+
+def make_update(user_id: int) -> Update:
+    user = User(user_id, f"u{user_id}", False)
+    chat = Chat(user_id, Chat.PRIVATE)
+    message = Message(1, datetime.now(timezone.utc), chat, from_user=user, text="привет")
+    return Update(user_id, message=message)
+
+
+def make_conversation() -> ConversationHandler:
+    async def enter(update, context):
+        return STATE
+
+    return ConversationHandler(
+        entry_points=[MessageHandler(filters.TEXT, enter)],
+        states={STATE: []},
+        fallbacks=[],
+    )
+
+
+async def enter_conversation(application, conversation, user_id: int):
+    update = make_update(user_id)
+    check = conversation.check_update(update)
+    context = CallbackContext.from_update(update, application)
+    await conversation.handle_update(update, application, check, context)
+
+
+def test_states_follow_conversation_handler():
+    application = Application.builder().token("123:TEST").build()
+    conversation = make_conversation()
+    states = ConversationStates(conversation)
+
+    async def scenario():
+        await enter_conversation(application, conversation, 7)
+        assert dict(states.items()) == {(7, 7): STATE}
+        assert list(states) == [(7, 7)] and len(states) == 1
+
+        states.end((7, 7))
+        assert len(states) == 0
+        # Повторный вход снова начинается с entry_points
+        assert conversation.check_update(make_update(7)) is not None
+
+    asyncio.run(scenario())
+
+
+def test_states_reject_incompatible_handler():
+    with pytest.raises(RuntimeError):
+        ConversationStates(SimpleNamespace())
+
+
+def make_sweeper(application, conversation) -> SessionSweeper:
+    sweeper = SessionSweeper(conversation, {STATE: 10}, 100)
+    # Все пользователи простаивают дольше любого таймаута
+    sweeper._started = time.monotonic() - 1000
+    return sweeper
+
+
+def test_sweep_keeps_sessions_when_save_fails(monkeypatch):
+    application = Application.builder().token("123:TEST").build()
+    conversation = make_conversation()
+    sweeper = make_sweeper(application, conversation)
+
+    async def failing_save(positions):
+        raise RuntimeError("БД недоступна")
+
+    monkeypatch.setattr(sessions, "save_quest_positions", failing_save)
+
+    async def scenario():
+        await enter_conversation(application, conversation, 1)
+        application.user_data[1]["quest_state"] = QuestSession(1, 0, 2)
+        with pytest.raises(RuntimeError):
+            await sweeper.sweep(SimpleNamespace(application=application))
+        assert "quest_state" in application.user_data[1]
+        assert len(sweeper.conversations) == 1
+
+    asyncio.run(scenario())
+
+
+def test_sweep_skips_users_who_return_during_save(monkeypatch):
+    application = Application.builder().token("123:TEST").build()
+    conversation = make_conversation()
+    sweeper = make_sweeper(application, conversation)
+    saved = []
+
+    async def save(positions):
+        saved.extend(positions)
+        # Пользователь 1 прислал апдейт, пока шла запись
+        await sweeper.track(make_update(1), None)
+
+    monkeypatch.setattr(sessions, "save_quest_positions", save)
+
+    async def scenario():
+        for user_id in (1, 2):
+            await enter_conversation(application, conversation, user_id)
+            application.user_data[user_id]["quest_state"] = QuestSession(1, 0, user_id)
+            application.user_data[user_id]["other"] = True
+        await sweeper.sweep(SimpleNamespace(application=application))
+
+        assert sorted(saved) == [(1, 1, 1), (2, 1, 2)]
+        assert "quest_state" in application.user_data[1]
+        assert "quest_state" not in application.user_data[2]
+        assert dict(sweeper.conversations.items()) == {(1, 1): STATE}
+        # Вытеснение попадёт в persistence при следующей записи
+        assert 2 in application._user_ids_to_be_updated_in_persistence
+
+    asyncio.run(scenario())
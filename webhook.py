@@ -0,0 +1,139 @@
+"""Режим webhook: встроенный HTTP-сервер на aiohttp.
+
+Telegram получает ответ 200 сразу после проверки секрета и постановки
+апдейта в ограниченную очередь ``application.update_queue`` — обработка
+идёт асинхронно в самом Application. Очередь разбирается не быстрее, чем
+процессор принимает апдейты в работу (``concurrency.AdmissionQueue``),
+поэтому при перегрузке она действительно заполняется — тогда сервер
+отвечает 503, и Telegram повторит доставку позже.
+
+Локально можно проверить без Telegram: запустить бота с ``BOT_MODE=webhook``
+без ``WEBHOOK_URL`` и отправить записанный Update через curl (см. README).
+"""
+
+import asyncio
+import hmac
+import logging
+import signal
+
+from aiohttp import web
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookStats:
+    """Счётчики для мониторинга приёма апдейтов."""
+
+    __slots__ = ("accepted", "rejected_secret", "rejected_invalid", "rejected_full")
+
+    def __init__(self):
+        self.accepted = 0
+        self.rejected_secret = 0
+        self.rejected_invalid = 0
+        self.rejected_full = 0
+
+
+webhook_stats = WebhookStats()
+
+
+class WebhookServer:
+    def __init__(self, application, path: str, secret: str = None,
+                 host: str = "0.0.0.0", port: int = 8080):
+        self.application = application
+        self.path = path
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get("/health", self.health)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret
+        ):
+            webhook_stats.rejected_secret += 1
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            # Корректный JSON, но не объект (``[]``, ``1``) — тоже не Update
+            if not isinstance(data, dict):
+                raise ValueError("Update должен быть JSON-объектом")
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError):
+            webhook_stats.rejected_invalid += 1
+            return web.Response(status=400)
+
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            webhook_stats.rejected_full += 1
+            logger.warning("Очередь апдейтов переполнена, апдейт %s отклонён", update.update_id)
+            return web.Response(status=503, headers={"Retry-After": "1"})
+
+        webhook_stats.accepted += 1
+        return web.Response(status=200)
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "queue": self.application.update_queue.qsize(),
+            "accepted": webhook_stats.accepted,
+            "rejected": webhook_stats.rejected_secret + webhook_stats.rejected_invalid
+            + webhook_stats.rejected_full,
+        })
+
+    async def start(self):
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("Webhook-сервер слушает %s:%d%s", self.host, self.port, self.path)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve_webhook(application, url: str, path: str, secret: str = None,
+                        port: int = 8080, allowed_updates=None):
+    """Запускает Application и HTTP-сервер до сигнала остановки.
+
+    ``url`` — публичный адрес бота; если не задан, webhook в Telegram не
+    регистрируется (локальная отладка).
+    """
+    server = WebhookServer(application, path, secret, port=port)
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+    try:
+        await server.start()
+        if url:
+            await application.bot.set_webhook(
+                url=url.rstrip("/") + path,
+                secret_token=secret,
+                allowed_updates=allowed_updates,
+                drop_pending_updates=True,
+            )
+            logger.info("Webhook зарегистрирован: %s%s", url.rstrip("/"), path)
+        await stop_event.wait()
+    finally:
+        await server.stop()
+        await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+